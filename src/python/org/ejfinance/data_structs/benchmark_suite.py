@@ -0,0 +1,425 @@
+import argparse
+import json
+import math
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pytest
+
+from .easy.build_min_heap import MinHeap, NumericMinHeap
+from .easy.contiguous_subarrays import (ContiguousSubarrayCounter, count_contiguous_subarrays_batch,
+                                        count_contiguous_subarrays_linear)
+from .easy.linked_list_practice import (LinkedList, PooledLinkedList, return_kth_to_end_data_many,
+                                        return_kth_to_end_node_data)
+from .easy.lists_practice import unique_char_check_batch
+from .easy.trie_practice import FrozenTrie, Trie
+from .medium.merge_sorted_iterables import merge
+from .medium.multiply_array_element_sans_self import (multiply_all_except_self, multiply_all_except_self_log,
+                                                      multiply_all_except_self_numpy)
+from .medium.multistack_practice import MultiStack
+from .medium.water_trapped_in_mountains import (IncrementalWaterTrapped, estimate_water_trapped,
+                                                estimate_water_trapped_2d, estimate_water_trapped_batch)
+
+"""Benchmark suite for the data structures and algorithms in data_structs
+
+Every case is a setup function taking (size, rng) and returning a zero argument
+callable, the operation under test. Setup runs again before every timed call, so
+operations that consume their input (e.g., pops) always start from the same state,
+and building the input is never part of the timing.
+
+Run from the src directory:
+  python -m python.org.ejfinance.data_structs.benchmark_suite --profile default --output bench.json
+  python -m python.org.ejfinance.data_structs.benchmark_suite --compare bench.json --case heap
+
+The comparison exits with status 1 when a case is slower (median) or uses more
+peak memory than the baseline by more than the threshold.
+"""
+
+# Input sizes per profile. Cases interpret size as their natural unit
+# (values, keys, nodes, cells)
+SIZE_PROFILES: Dict[str, Sequence[int]] = {
+  'smoke': (100,),
+  'default': (10**3, 10**4, 10**5),
+  'large': (10**4, 10**5, 10**6),
+}
+
+# Median timings below this many seconds are dominated by timer noise, and are not compared
+NOISE_FLOOR_SECONDS = 50e-6
+
+_CASES: Dict[str, Callable[[int, np.random.Generator], Callable[[], Any]]] = {}
+
+def _case(name: str):
+  def register(setup: Callable[[int, np.random.Generator], Callable[[], Any]]):
+    _CASES[name] = setup
+    return setup
+  return register
+
+def _random_keys(size: int, rng: np.random.Generator, length: int = 8) -> List[str]:
+  codes = rng.integers(ord('a'), ord('z') + 1, size=(size, length), dtype=np.uint8)
+  return [row.tobytes().decode('ascii') for row in codes]
+
+@_case('min_heap.heapify')
+def _min_heap_heapify(size, rng):
+  values = rng.integers(0, 1 << 30, size=size).tolist()
+  return lambda: MinHeap(values)
+
+@_case('min_heap.insert_extract')
+def _min_heap_insert_extract(size, rng):
+  values = rng.integers(0, 1 << 30, size=size).tolist()
+  def run():
+    heap = MinHeap([])
+    for value in values:
+      heap.insert(value)
+    for _ in range(size):
+      heap.extract_min()
+  return run
+
+@_case('min_heap.push_pop_many')
+def _min_heap_push_pop_many(size, rng):
+  values = rng.integers(0, 1 << 30, size=size).tolist()
+  def run():
+    heap = MinHeap(values[:size // 2])
+    heap.push_many(values[size // 2:])
+    heap.pop_many(size)
+  return run
+
+@_case('numeric_min_heap.nsmallest')
+def _numeric_min_heap_nsmallest(size, rng):
+  keys = rng.random(size)
+  return lambda: NumericMinHeap(keys).nsmallest(max(1, size // 100))
+
+@_case('trie.insert_many')
+def _trie_insert_many(size, rng):
+  keys = _random_keys(size, rng)
+  return lambda: Trie().insert_many(keys)
+
+@_case('trie.lookup_many')
+def _trie_lookup_many(size, rng):
+  keys = _random_keys(size, rng)
+  trie = Trie()
+  trie.insert_many(keys[::2])
+  return lambda: trie.lookup_many(keys)
+
+@_case('frozen_trie.lookup')
+def _frozen_trie_lookup(size, rng):
+  keys = _random_keys(size, rng)
+  frozen = FrozenTrie.from_keys(keys[::2])
+  def run():
+    for key in keys:
+      frozen.lookup(key)
+  return run
+
+@_case('linked_list.extend')
+def _linked_list_extend(size, rng):
+  values = rng.integers(0, 1 << 30, size=size).tolist()
+  return lambda: LinkedList().extend(values)
+
+@_case('pooled_linked_list.extend')
+def _pooled_linked_list_extend(size, rng):
+  values = rng.integers(0, 1 << 30, size=size).tolist()
+  return lambda: PooledLinkedList().extend(values)
+
+@_case('linked_list.kth_to_end')
+def _linked_list_kth_to_end(size, rng):
+  llist = LinkedList()
+  llist.extend(rng.integers(0, 1 << 30, size=size).tolist())
+  return lambda: return_kth_to_end_node_data(llist, size // 2)
+
+@_case('linked_list.kth_to_end_many')
+def _linked_list_kth_to_end_many(size, rng):
+  llist = LinkedList()
+  llist.extend(rng.integers(0, 1 << 30, size=size).tolist())
+  ks = rng.integers(0, size, size=100).tolist()
+  return lambda: return_kth_to_end_data_many(llist, ks)
+
+@_case('multistack.push_pop')
+def _multistack_push_pop(size, rng):
+  values = rng.random(size).tolist()
+  def run():
+    stacks = MultiStack(3, size)
+    for value in values:
+      stacks.push(1, value)
+    for _ in range(size):
+      stacks.pop(1)
+  return run
+
+@_case('multistack.push_pop_many')
+def _multistack_push_pop_many(size, rng):
+  values = rng.random(size)
+  def run():
+    stacks = MultiStack(3, size)
+    stacks.push_many(1, values)
+    stacks.pop_many(1, size)
+  return run
+
+@_case('contiguous_subarrays.linear')
+def _contiguous_subarrays_linear(size, rng):
+  values = rng.integers(0, 1000, size=size)
+  return lambda: count_contiguous_subarrays_linear(values)
+
+@_case('contiguous_subarrays.batch')
+def _contiguous_subarrays_batch(size, rng):
+  rows = rng.integers(0, 1000, size=(max(1, size // 100), 100))
+  return lambda: count_contiguous_subarrays_batch(rows)
+
+@_case('contiguous_subarrays.counter')
+def _contiguous_subarrays_counter(size, rng):
+  values = rng.integers(0, 1000, size=size).tolist()
+  def run():
+    counter = ContiguousSubarrayCounter()
+    for value in values:
+      counter.append(value)
+    counter.counts()
+  return run
+
+@_case('water_trapped.estimate')
+def _water_trapped_estimate(size, rng):
+  heights = rng.random(size)
+  return lambda: estimate_water_trapped(heights)
+
+@_case('water_trapped.batch')
+def _water_trapped_batch(size, rng):
+  heights = rng.random((max(1, size // 100), 100))
+  return lambda: estimate_water_trapped_batch(heights)
+
+@_case('water_trapped.2d')
+def _water_trapped_2d(size, rng):
+  side = max(3, math.isqrt(size))
+  heightmap = rng.random((side, side))
+  return lambda: estimate_water_trapped_2d(heightmap)
+
+@_case('water_trapped.incremental_update')
+def _water_trapped_incremental_update(size, rng):
+  water = IncrementalWaterTrapped(rng.random(size).tolist())
+  updates = list(zip(rng.integers(0, size, size=1000).tolist(), rng.random(1000).tolist()))
+  def run():
+    for (index, height) in updates:
+      water.update(index, height)
+    water.total()
+  return run
+
+def _multipliers(size: int, rng: np.random.Generator) -> np.ndarray:
+  # Spread tightly around 1, so products of up to millions of values stay finite
+  return np.exp(rng.normal(0, 1e-3, size=size))
+
+@_case('product_except_self.reference')
+def _product_except_self_reference(size, rng):
+  multipliers = _multipliers(size, rng).tolist()
+  return lambda: multiply_all_except_self(multipliers)
+
+@_case('product_except_self.numpy')
+def _product_except_self_numpy(size, rng):
+  multipliers = _multipliers(size, rng)
+  return lambda: multiply_all_except_self_numpy(multipliers)
+
+@_case('product_except_self.log')
+def _product_except_self_log(size, rng):
+  multipliers = _multipliers(size, rng)
+  return lambda: multiply_all_except_self_log(multipliers)
+
+@_case('unique_char_check.batch')
+def _unique_char_check_batch(size, rng):
+  strings = _random_keys(max(1, size // 16), rng, length=16)
+  return lambda: unique_char_check_batch(strings)
+
+@_case('merge.sorted_lists')
+def _merge_sorted_lists(size, rng):
+  sources = [np.sort(part).tolist() for part in np.array_split(rng.integers(0, 1 << 30, size=size), 8)]
+  def run():
+    for _ in merge(*sources):
+      pass
+  return run
+
+def case_names() -> List[str]:
+  return list(_CASES)
+
+def run_case(name: str, size: int, warmup: int = 1, repeats: int = 5, seed: int = 0) -> Dict[str, Any]:
+  """Time one case at one input size
+
+  :param warmup: Untimed calls before measuring (caches, allocator, lazy imports)
+  :param repeats: Timed calls. Median and 95th percentile are taken over these
+  :return: Timing statistics in seconds, and peak traced bytes of one extra call
+  """
+  if repeats < 1:
+    raise ValueError("At least one timed repeat is required.")
+  def setup() -> Callable[[], Any]:
+    # A fresh generator per call, so every call gets the same input
+    return _CASES[name](size, np.random.default_rng(seed))
+
+  for _ in range(warmup):
+    setup()()
+
+  timings: List[float] = []
+  for _ in range(repeats):
+    operation = setup()
+    tic = time.perf_counter()
+    operation()
+    timings.append(time.perf_counter() - tic)
+
+  # Separate pass, since tracing slows down every allocation
+  operation = setup()
+  tracemalloc.start()
+  try:
+    operation()
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+  finally:
+    tracemalloc.stop()
+
+  return {
+    'case': name,
+    'size': size,
+    'repeats': repeats,
+    'median_s': statistics.median(timings),
+    'p95_s': float(np.percentile(timings, 95)),
+    'min_s': min(timings),
+    'peak_bytes': peak_bytes,
+  }
+
+def run_suite(sizes: Iterable[int] = SIZE_PROFILES['default'], cases: Optional[Iterable[str]] = None,
+              warmup: int = 1, repeats: int = 5, seed: int = 0,
+              progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+  """Run every selected case at every size
+
+  :param cases: Case names, or substrings of them (e.g., 'heap'). All cases by default
+  :param progress: Called with each result as it completes
+  :return: JSON serializable report, with results keyed by "case[size]"
+  """
+  selected = case_names() if cases is None else [name for name in case_names()
+                                                 if any(pattern in name for pattern in cases)]
+  if not selected:
+    raise ValueError("No benchmark case matches the selection.")
+  sizes = list(sizes)
+  results: Dict[str, Dict[str, Any]] = {}
+  for name in selected:
+    for size in sizes:
+      result = run_case(name, size, warmup=warmup, repeats=repeats, seed=seed)
+      results[f"{name}[{size}]"] = result
+      if progress is not None:
+        progress(result)
+  return {
+    'meta': {
+      'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+      'python': platform.python_version(),
+      'numpy': np.__version__,
+      'platform': platform.platform(),
+      'sizes': sizes,
+      'warmup': warmup,
+      'repeats': repeats,
+      'seed': seed,
+    },
+    'results': results,
+  }
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.2,
+            noise_floor: float = NOISE_FLOOR_SECONDS) -> List[Dict[str, Any]]:
+  """Find cases that regressed against a baseline report
+
+  Only cases present in both reports are compared.
+
+  :param threshold: Allowed relative increase (0.2 means up to 20% slower or larger)
+  :param noise_floor: Skip timing comparison when both medians are below this many seconds
+  :return: One entry per regressed metric, with the baseline and current values
+  """
+  regressions: List[Dict[str, Any]] = []
+  for (key, result) in current['results'].items():
+    base = baseline['results'].get(key)
+    if base is None:
+      continue
+    for metric in ('median_s', 'peak_bytes'):
+      (before, after) = (base[metric], result[metric])
+      if metric == 'median_s' and max(before, after) < noise_floor:
+        continue
+      if after > before * (1 + threshold) and after > 0:
+        regressions.append({'key': key, 'metric': metric, 'baseline': before, 'current': after,
+                            'ratio': after / before if before else math.inf})
+  return regressions
+
+def _format_result(result: Dict[str, Any]) -> str:
+  return (f"{result['case'] + '[' + str(result['size']) + ']':<50} "
+          f"median {result['median_s'] * 1e3:10.3f} ms  p95 {result['p95_s'] * 1e3:10.3f} ms  "
+          f"peak {result['peak_bytes'] / 1024:10.1f} KiB")
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+  parser = argparse.ArgumentParser(description="Benchmark the data structures and algorithms in data_structs")
+  parser.add_argument('--profile', choices=sorted(SIZE_PROFILES), default='default')
+  parser.add_argument('--sizes', type=int, nargs='+', help="Input sizes (overrides --profile)")
+  parser.add_argument('--case', action='append', dest='cases',
+                      help="Run cases whose name contains this (repeatable)")
+  parser.add_argument('--warmup', type=int, default=1)
+  parser.add_argument('--repeats', type=int, default=5)
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--output', help="Write the JSON report to this path")
+  parser.add_argument('--compare', metavar='BASELINE', help="JSON report to check for regressions against")
+  parser.add_argument('--threshold', type=float, default=0.2)
+  parser.add_argument('--list', action='store_true', help="List case names and exit")
+  args = parser.parse_args(argv)
+
+  if args.list:
+    print('\n'.join(case_names()))
+    return 0
+
+  report = run_suite(args.sizes or SIZE_PROFILES[args.profile], cases=args.cases, warmup=args.warmup,
+                     repeats=args.repeats, seed=args.seed, progress=lambda r: print(_format_result(r)))
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(report, f, indent=2)
+
+  if args.compare:
+    with open(args.compare) as f:
+      baseline = json.load(f)
+    regressions = compare(baseline, report, threshold=args.threshold)
+    for regression in regressions:
+      print(f"REGRESSION {regression['key']} {regression['metric']}: "
+            f"{regression['baseline']:.6g} -> {regression['current']:.6g} ({regression['ratio']:.2f}x)")
+    if regressions:
+      return 1
+    print("No regressions.")
+  return 0
+
+@pytest.mark.parametrize("name", case_names())
+def test_case_runs(name):
+  result = run_case(name, SIZE_PROFILES['smoke'][0], warmup=0, repeats=2)
+  assert result['case'] == name
+  assert 0 <= result['min_s'] <= result['median_s'] <= result['p95_s']
+  assert result['peak_bytes'] >= 0
+
+def test_run_case_repeats_identical_inputs(monkeypatch):
+  inputs: List[List[float]] = []
+  def setup(size, rng):
+    inputs.append(rng.random(size).tolist())
+    return lambda: None
+  monkeypatch.setitem(_CASES, 'test.identical_inputs', setup)
+  run_case('test.identical_inputs', 4, warmup=1, repeats=3)
+  assert len(inputs) == 5 and all(values == inputs[0] for values in inputs)
+
+def test_compare_flags_regressions():
+  def report(median_s, peak_bytes):
+    return {'results': {'case[10]': {'median_s': median_s, 'peak_bytes': peak_bytes}}}
+  assert compare(report(1.0, 100), report(1.1, 100)) == []
+  regressions = compare(report(1.0, 100), report(1.5, 300))
+  assert [(r['metric'], r['ratio']) for r in regressions] == [('median_s', 1.5), ('peak_bytes', 3.0)]
+  # Timer noise on tiny cases, and cases missing from the baseline, are ignored
+  assert compare(report(1e-6, 100), report(9e-6, 100)) == []
+  assert compare({'results': {}}, report(1.0, 100)) == []
+
+def test_main_writes_and_compares(tmp_path, capsys):
+  baseline = tmp_path / 'baseline.json'
+  assert main(['--sizes', '50', '--case', 'min_heap.heapify', '--repeats', '1',
+               '--output', str(baseline)]) == 0
+  report = json.loads(baseline.read_text())
+  assert list(report['results']) == ['min_heap.heapify[50]']
+
+  # A baseline that is far faster and smaller than any real run must be flagged
+  report['results']['min_heap.heapify[50]'].update(median_s=1e-9, peak_bytes=1)
+  baseline.write_text(json.dumps(report))
+  assert main(['--sizes', '50', '--case', 'min_heap.heapify', '--repeats', '1',
+               '--compare', str(baseline), '--threshold', '0.5']) == 1
+  assert 'REGRESSION min_heap.heapify[50] peak_bytes' in capsys.readouterr().out
+
+if (__name__ == '__main__'):
+  sys.exit(main())
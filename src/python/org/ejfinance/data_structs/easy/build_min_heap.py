@@ -1,9 +1,23 @@
+import heapq
 import math
+import sys
+import random
+import time
 from optparse import Values
-from typing import Tuple, Iterable
+from typing import Any, Dict, Hashable, Tuple, Iterable, Optional
 
+import numpy as np
 import pytest
 
+from ..instrumentation import instrument, instrumented
+
+def _record_sift(stats, comparisons: int, levels: int):
+  # Each level moved is one parent/child swap, done as a single write
+  stats.add('min_heap.sifts')
+  stats.add('min_heap.comparisons', comparisons)
+  stats.add('min_heap.swaps', levels)
+  stats.record_max('min_heap.max_sift_depth', levels)
+
 class MinHeap:
   """Traditional MinHeap data structure implementation
   
@@ -27,11 +41,23 @@ class MinHeap:
       is larger than either child, swap it with the smaller child node. Repeat
       for that child if a swap is done until your are at the bottom level of the
       tree or the current value is smaller than both children.
+    - Construction - Floyd's bottom-up heapify. Sift down every internal node,
+      from the last one up to the root, in O(n)
+    - Bulk operations - push_many, pop_many, pushpop and replace avoid the
+      per-item overhead of separate insert/extract_min calls
+    - Instrumentation - instrument(heap) swaps in sift methods that count
+      comparisons, swaps and sift depth, for that heap only
   """
+  _INSTRUMENTED = {'_sift_up': '_counted_sift_up', '_sift_down': '_counted_sift_down'}
+  _TIMED = {'push_many': 'min_heap.push_many', 'pop_many': 'min_heap.pop_many'}
+
   def __init__(self, init_values: Iterable[int]):
-    self.values = list()
-    for i in init_values:
-      self.insert(i)
+    # Floyd's bottom-up heapify is O(n), versus O(n log n) for one insert per value
+    self.values = list(init_values)
+    self._heapify()
+
+  def __len__(self) -> int:
+    return len(self.values)
 
   def _get_parent_idx(self, child_idx: int):
     if child_idx == 0:
@@ -43,72 +69,639 @@ class MinHeap:
     right_child_idx: int = 2 * parent_idx + 2
     return (left_child_idx, right_child_idx)
 
-  def insert(self, value):
-    self.values.append(value)
+  def _heapify(self):
+    # Leaves are already valid heaps, so sift down every internal node from the last one up
+    for idx in reversed(range(len(self.values) // 2)):
+      self._sift_down(idx)
 
-    # Bubble up the node
-    if len(self.values) > 1:  
-      curr_idx = len(self.values) - 1
-      parent_idx = self._get_parent_idx(curr_idx)
+  def _sift_up(self, curr_idx: int):
+    # Bubble the node up until it is the root or the parent is a lower value.
+    # The moving value is held aside and written once, instead of swapping at every level
+    values = self.values
+    value = values[curr_idx]
+    while curr_idx > 0:
+      parent_idx = (curr_idx - 1) >> 1
+      parent = values[parent_idx]
+      if not value < parent:
+        break
+      values[curr_idx] = parent
+      curr_idx = parent_idx
+    values[curr_idx] = value
 
-      while self.values[curr_idx] < self.values[parent_idx]:
-        self.values[parent_idx], self.values[curr_idx] = (self.values[curr_idx],
-                                                          self.values[parent_idx])
+  def _sift_down(self, curr_idx: int):
+    # Bubble the node down until it is smaller than both children or is a leaf
+    values = self.values
+    size = len(values)
+    value = values[curr_idx]
+    child_idx = 2 * curr_idx + 1
+    while child_idx < size:
+      # Select the smaller child
+      right_child_idx = child_idx + 1
+      if right_child_idx < size and values[right_child_idx] < values[child_idx]:
+        child_idx = right_child_idx
+      if not values[child_idx] < value:
+        break
+      values[curr_idx] = values[child_idx]
+      curr_idx = child_idx
+      child_idx = 2 * curr_idx + 1
+    values[curr_idx] = value
 
-        # Exit if we just replaced the root node
-        if parent_idx == 0:
-          break
+  def _counted_sift_up(self, curr_idx: int):
+    values = self.values
+    value = values[curr_idx]
+    comparisons = levels = 0
+    while curr_idx > 0:
+      parent_idx = (curr_idx - 1) >> 1
+      parent = values[parent_idx]
+      comparisons += 1
+      if not value < parent:
+        break
+      values[curr_idx] = parent
+      levels += 1
+      curr_idx = parent_idx
+    values[curr_idx] = value
+    _record_sift(self._stats, comparisons, levels)
 
-        # Prepare for check if we need to bubble up again
-        curr_idx = parent_idx
-        parent_idx = self._get_parent_idx(curr_idx)
-    
-    return
+  def _counted_sift_down(self, curr_idx: int):
+    values = self.values
+    size = len(values)
+    value = values[curr_idx]
+    child_idx = 2 * curr_idx + 1
+    comparisons = levels = 0
+    while child_idx < size:
+      right_child_idx = child_idx + 1
+      if right_child_idx < size:
+        comparisons += 1
+        if values[right_child_idx] < values[child_idx]:
+          child_idx = right_child_idx
+      comparisons += 1
+      if not values[child_idx] < value:
+        break
+      values[curr_idx] = values[child_idx]
+      levels += 1
+      curr_idx = child_idx
+      child_idx = 2 * curr_idx + 1
+    values[curr_idx] = value
+    _record_sift(self._stats, comparisons, levels)
+
+  def insert(self, value):
+    self.values.append(value)
+    self._sift_up(len(self.values) - 1)
 
   def extract_min(self):
     # Return Exception if there is no value to pop
     if len(self.values) == 0:
       raise Exception("No value in heap to pop.")
 
-    # If the tree is a single node, pop the value and return it
-    if len(self.values) == 1:
-      return self.values.pop() 
-      
-    # Extract the min value that will be returned
+    # Replace the root with the last node and bubble it down
+    last_value = self.values.pop()
+    if len(self.values) == 0:
+      return last_value
     min_value = self.values[0]
+    self.values[0] = last_value
+    self._sift_down(0)
+    return min_value
+
+  def push_many(self, values: Iterable):
+    """Insert many values
+
+    Appends all values, then re-heapifies (O(n + k)) when the batch is at least as
+    large as the heap, else sifts up each new value (O(k log(n + k))).
+    """
+    start_size = len(self.values)
+    self.values.extend(values)
+    added = len(self.values) - start_size
+    if added == 0:
+      return
+    if added >= start_size:
+      self._heapify()
+    else:
+      for idx in range(start_size, len(self.values)):
+        self._sift_up(idx)
+
+  def pop_many(self, k: int) -> list:
+    """Extract the k smallest values, in ascending order"""
+    if k < 0:
+      raise ValueError("Number of values to pop must be non-negative.")
+    if k > len(self.values):
+      raise Exception(f"Cannot pop {k} values from a heap of size {len(self.values)}.")
+
+    # Popping everything is just a sort
+    if k == len(self.values):
+      popped = sorted(self.values)
+      self.values = []
+      return popped
+    return [self.extract_min() for _ in range(k)]
+
+  def pushpop(self, value):
+    """Insert value, then extract the min value (faster than insert + extract_min)"""
+    if len(self.values) == 0 or not self.values[0] < value:
+      return value
+    min_value, self.values[0] = self.values[0], value
+    self._sift_down(0)
+    return min_value
+
+  def replace(self, value):
+    """Extract the min value, then insert value (faster than extract_min + insert)
+
+    Unlike pushpop, the returned value may be larger than the inserted one.
+    """
+    if len(self.values) == 0:
+      raise Exception("No value in heap to pop.")
+    min_value, self.values[0] = self.values[0], value
+    self._sift_down(0)
+    return min_value
+
+class IndexedMinHeap(MinHeap):
+  """MinHeap whose entries can be found, re-prioritized and removed by handle
+
+  Conditions:
+    1) Support tuples (e.g., (distance, node) for Dijkstra)
+    2) Each entry has a unique hashable handle, chosen by the caller or
+       generated (consecutive ints) on insert
+    3) decrease_key, remove and contains in O(log n), O(log n) and O(1)
+
+  Example:
+    h = IndexedMinHeap([])
+    a = h.insert(10); b = h.insert(8)
+    h.decrease_key(a, 4) -> extract_min call return values: 4, 8
+
+  Approach:
+    - Same array layout as MinHeap, plus a parallel list of handles and a
+      dict of handle -> array index (the position map)
+    - Every move done by _sift_up/_sift_down also moves the handle and updates
+      its position, so an entry can be located in O(1)
+    - decrease_key - Overwrite the value and bubble it up
+    - remove - Move the last entry into the hole, then bubble it up or down
+  """
+  # The counted MinHeap sift methods do not move handles, so only timers apply here
+  _INSTRUMENTED: Dict[str, str] = {}
+  _TIMED = {'push_many': 'indexed_min_heap.push_many', 'pop_many': 'indexed_min_heap.pop_many',
+            'decrease_key': 'indexed_min_heap.decrease_key', 'remove': 'indexed_min_heap.remove'}
+
+  def __init__(self, init_values: Iterable[Any]):
+    # Initial values get handles 0..n-1. _heapify keeps the position map up to date
+    self.values = list(init_values)
+    self._handles: list = list(range(len(self.values)))
+    self._positions: Dict[Hashable, int] = {handle: handle for handle in self._handles}
+    self._next_handle: int = len(self.values)
+    self._heapify()
+
+  def _new_handle(self) -> int:
+    # Skip generated handles that collide with caller-chosen ones
+    while self._next_handle in self._positions:
+      self._next_handle += 1
+    handle = self._next_handle
+    self._next_handle += 1
+    return handle
+
+  def _sift_up(self, curr_idx: int):
+    values, handles, positions = self.values, self._handles, self._positions
+    value, handle = values[curr_idx], handles[curr_idx]
+    while curr_idx > 0:
+      parent_idx = (curr_idx - 1) >> 1
+      parent = values[parent_idx]
+      if not value < parent:
+        break
+      values[curr_idx] = parent
+      handles[curr_idx] = handles[parent_idx]
+      positions[handles[curr_idx]] = curr_idx
+      curr_idx = parent_idx
+    values[curr_idx] = value
+    handles[curr_idx] = handle
+    positions[handle] = curr_idx
 
-    # Update the tree by replacing the root with the largest node and bubbling it down
-    self.values[0] = self.values[-1]
-    self.values.pop()
-
-    # Bubble the new root down until the tree is correct
-    curr_idx = 0
-    while (True):
-      (left_child_idx, right_child_idx) = self._get_children_idxs(curr_idx)
-      replacement_idx = None
-      
-      # Is the left child is a candidate to bubble up and replace the current node?
-      if (left_child_idx < len(self.values) and
-          self.values[left_child_idx] < self.values[curr_idx]):
-        replacement_idx = left_child_idx
-
-      # Is the right child is a candidate to bubble up and replace the current node?
-      if (right_child_idx < len(self.values) and
-          self.values[right_child_idx] < self.values[curr_idx]):
-        replacement_idx = (right_child_idx if (replacement_idx is None) else
-                           right_child_idx if (self.values[right_child_idx] < self.values[replacement_idx])
-                           else replacement_idx)
-
-      # Swap the current node and its selected child
-      if replacement_idx != None:
-        self.values[replacement_idx], self.values[curr_idx] = (self.values[curr_idx], 
-                                                               self.values[replacement_idx])
-        curr_idx = replacement_idx
-      else:
+  def _sift_down(self, curr_idx: int):
+    values, handles, positions = self.values, self._handles, self._positions
+    size = len(values)
+    value, handle = values[curr_idx], handles[curr_idx]
+    child_idx = 2 * curr_idx + 1
+    while child_idx < size:
+      right_child_idx = child_idx + 1
+      if right_child_idx < size and values[right_child_idx] < values[child_idx]:
+        child_idx = right_child_idx
+      if not values[child_idx] < value:
         break
+      values[curr_idx] = values[child_idx]
+      handles[curr_idx] = handles[child_idx]
+      positions[handles[curr_idx]] = curr_idx
+      curr_idx = child_idx
+      child_idx = 2 * curr_idx + 1
+    values[curr_idx] = value
+    handles[curr_idx] = handle
+    positions[handle] = curr_idx
+
+  def insert(self, value, handle: Optional[Hashable] = None) -> Hashable:
+    """Insert value and return its handle"""
+    if handle is None:
+      handle = self._new_handle()
+    elif handle in self._positions:
+      raise ValueError(f"Handle {handle!r} is already in the heap.")
+    self.values.append(value)
+    self._handles.append(handle)
+    self._sift_up(len(self.values) - 1)
+    return handle
+
+  def push_many(self, values: Iterable):
+    for value in values:
+      self.insert(value)
+
+  def _remove_at(self, idx: int):
+    value, handle = self.values[idx], self._handles[idx]
+    del self._positions[handle]
+    last_value, last_handle = self.values.pop(), self._handles.pop()
+    if idx < len(self.values):
+      self.values[idx], self._handles[idx] = last_value, last_handle
+      self._sift_down(idx)
+      self._sift_up(idx)
+    return (handle, value)
+
+  def extract_min_item(self) -> Tuple[Hashable, Any]:
+    """Extract the min entry as a (handle, value) tuple"""
+    if len(self.values) == 0:
+      raise Exception("No value in heap to pop.")
+    return self._remove_at(0)
 
+  def extract_min(self):
+    return self.extract_min_item()[1]
+
+  def pop_many(self, k: int) -> list:
+    if k < 0:
+      raise ValueError("Number of values to pop must be non-negative.")
+    if k > len(self.values):
+      raise Exception(f"Cannot pop {k} values from a heap of size {len(self.values)}.")
+    return [self.extract_min() for _ in range(k)]
+
+  def pushpop(self, value):
+    if len(self.values) == 0 or not self.values[0] < value:
+      return value
+    self.insert(value)
+    return self.extract_min()
+
+  def replace(self, value):
+    min_value = self.extract_min()
+    self.insert(value)
     return min_value
 
+  def contains(self, handle: Hashable) -> bool:
+    return handle in self._positions
+
+  def __contains__(self, handle: Hashable) -> bool:
+    return handle in self._positions
+
+  def get(self, handle: Hashable):
+    """Return the value stored for handle"""
+    return self.values[self._position(handle)]
+
+  def _position(self, handle: Hashable) -> int:
+    try:
+      return self._positions[handle]
+    except KeyError:
+      raise KeyError(f"Handle {handle!r} is not in the heap.") from None
+
+  def decrease_key(self, handle: Hashable, new_value):
+    idx = self._position(handle)
+    if self.values[idx] < new_value:
+      raise ValueError(f"New value {new_value!r} is larger than the current value {self.values[idx]!r}.")
+    self.values[idx] = new_value
+    self._sift_up(idx)
+
+  def remove(self, handle: Hashable):
+    """Remove the entry for handle and return its value"""
+    return self._remove_at(self._position(handle))[1]
+
+class NumericMinHeap:
+  """MinHeap of numeric keys stored in a growable NumPy array
+
+  Conditions:
+    1) Keys are int64 or float64 (no boxed Python objects, so 8 bytes per key
+       instead of a list slot plus an int/float object, 32-36 bytes)
+    2) Optional int64 payload column (e.g., an event or row id) moved with each key
+    3) Bulk operations take and return ndarrays
+
+  Approach:
+    - Same binary heap layout as MinHeap in self._keys[:len(self)], grown
+      geometrically (doubling) when full
+    - Single insert/extract_min - Scalar sift up/down, as in MinHeap
+    - Vectorized heapify - Nodes on the same level of the tree root disjoint
+      subtrees, so all of them can be sifted down at once with array operations.
+      Levels are processed bottom-up (Floyd), for O(n) work in O(log^2 n) NumPy calls
+    - push_many - Append the batch, then either sift up each new key or re-heapify,
+      whichever is cheaper for the batch size
+    - nsmallest(k) - Small k walks the heap with a k-sized frontier. Large k uses
+      np.partition on the live keys (O(n)), then sorts only the k results
+    - pop_many(k) - Large k selects the k smallest with np.argpartition, compacts
+      the rest and re-heapifies, instead of k scalar extract_min calls
+  """
+  # nsmallest/pop_many switch to np.partition above this many values
+  PARTITION_THRESHOLD = 64
+
+  def __init__(self, init_keys: Iterable = (), dtype=np.float64, payload: bool = False,
+               init_payloads: Optional[Iterable] = None, capacity: int = 16):
+    self.dtype = np.dtype(dtype)
+    if self.dtype not in (np.dtype(np.int64), np.dtype(np.float64)):
+      raise ValueError(f"Unsupported key dtype {self.dtype}. Use int64 or float64.")
+    self._size: int = 0
+    self._keys: np.ndarray = np.empty(max(capacity, 1), dtype=self.dtype)
+    self._payloads: Optional[np.ndarray] = (np.empty(max(capacity, 1), dtype=np.int64)
+                                            if payload else None)
+    init_keys = np.asarray(list(init_keys) if not isinstance(init_keys, np.ndarray) else init_keys)
+    if init_keys.size:
+      self.push_many(init_keys, None if init_payloads is None else np.asarray(list(init_payloads)))
+
+  def __len__(self) -> int:
+    return self._size
+
+  @property
+  def has_payload(self) -> bool:
+    return self._payloads is not None
+
+  @property
+  def keys(self) -> np.ndarray:
+    """Read-only view of the live keys, in heap order"""
+    view = self._keys[:self._size]
+    view.flags.writeable = False
+    return view
+
+  @property
+  def nbytes(self) -> int:
+    return self._keys.nbytes + (0 if self._payloads is None else self._payloads.nbytes)
+
+  def _reserve(self, size: int):
+    if size <= len(self._keys):
+      return
+    capacity = len(self._keys)
+    while capacity < size:
+      capacity *= 2
+    keys = np.empty(capacity, dtype=self.dtype)
+    keys[:self._size] = self._keys[:self._size]
+    self._keys = keys
+    if self._payloads is not None:
+      payloads = np.empty(capacity, dtype=np.int64)
+      payloads[:self._size] = self._payloads[:self._size]
+      self._payloads = payloads
+
+  def _check_payload(self, payload) -> None:
+    if (payload is None) != (self._payloads is None):
+      raise ValueError("Payload must be given if and only if the heap was created with payload=True.")
+
+  def _sift_up(self, curr_idx: int):
+    keys, payloads = self._keys, self._payloads
+    key = keys[curr_idx]
+    payload = None if payloads is None else payloads[curr_idx]
+    while curr_idx > 0:
+      parent_idx = (curr_idx - 1) >> 1
+      if not key < keys[parent_idx]:
+        break
+      keys[curr_idx] = keys[parent_idx]
+      if payloads is not None:
+        payloads[curr_idx] = payloads[parent_idx]
+      curr_idx = parent_idx
+    keys[curr_idx] = key
+    if payloads is not None:
+      payloads[curr_idx] = payload
+
+  def _sift_down(self, curr_idx: int):
+    keys, payloads, size = self._keys, self._payloads, self._size
+    key = keys[curr_idx]
+    payload = None if payloads is None else payloads[curr_idx]
+    child_idx = 2 * curr_idx + 1
+    while child_idx < size:
+      if child_idx + 1 < size and keys[child_idx + 1] < keys[child_idx]:
+        child_idx += 1
+      if not keys[child_idx] < key:
+        break
+      keys[curr_idx] = keys[child_idx]
+      if payloads is not None:
+        payloads[curr_idx] = payloads[child_idx]
+      curr_idx = child_idx
+      child_idx = 2 * curr_idx + 1
+    keys[curr_idx] = key
+    if payloads is not None:
+      payloads[curr_idx] = payload
+
+  def _sift_down_many(self, idxs: np.ndarray):
+    # Sift down nodes with disjoint subtrees simultaneously, one tree level per iteration
+    keys, payloads, size = self._keys, self._payloads, self._size
+    while idxs.size:
+      child_idxs = 2 * idxs + 1
+      in_tree = child_idxs < size
+      idxs, child_idxs = idxs[in_tree], child_idxs[in_tree]
+
+      # Select the smaller child
+      right_idxs = np.minimum(child_idxs + 1, size - 1)
+      take_right = (child_idxs + 1 < size) & (keys[right_idxs] < keys[child_idxs])
+      child_idxs[take_right] += 1
+
+      swap = keys[child_idxs] < keys[idxs]
+      idxs, child_idxs = idxs[swap], child_idxs[swap]
+      keys[idxs], keys[child_idxs] = keys[child_idxs], keys[idxs]
+      if payloads is not None:
+        payloads[idxs], payloads[child_idxs] = payloads[child_idxs], payloads[idxs]
+      idxs = child_idxs
+
+  def _heapify(self):
+    last_parent_idx = self._size // 2 - 1
+    if last_parent_idx < 0:
+      return
+    depth = (last_parent_idx + 1).bit_length() - 1
+    while depth >= 0:
+      level_start = (1 << depth) - 1
+      level_end = min((1 << (depth + 1)) - 1, last_parent_idx + 1)
+      self._sift_down_many(np.arange(level_start, level_end, dtype=np.int64))
+      depth -= 1
+
+  def insert(self, key, payload: Optional[int] = None):
+    self._check_payload(payload)
+    self._reserve(self._size + 1)
+    self._keys[self._size] = key
+    if self._payloads is not None:
+      self._payloads[self._size] = payload
+    self._size += 1
+    self._sift_up(self._size - 1)
+
+  def push_many(self, keys: np.ndarray, payloads: Optional[np.ndarray] = None):
+    keys = np.asarray(keys, dtype=self.dtype).ravel()
+    self._check_payload(payloads)
+    if payloads is not None and len(payloads) != len(keys):
+      raise ValueError("Keys and payloads must have the same length.")
+    start_size = self._size
+    self._reserve(start_size + len(keys))
+    self._keys[start_size:start_size + len(keys)] = keys
+    if self._payloads is not None:
+      self._payloads[start_size:start_size + len(keys)] = payloads
+    self._size += len(keys)
+
+    # Sifting up k keys costs about k * log(n) scalar steps, heapify about n vectorized ones
+    if len(keys) * max(self._size.bit_length(), 1) * 16 > self._size:
+      self._heapify()
+    else:
+      for idx in range(start_size, self._size):
+        self._sift_up(idx)
+
+  def peek(self):
+    if self._size == 0:
+      raise Exception("No value in heap to peek.")
+    return self._item(0)
+
+  def _item(self, idx: int):
+    key = self._keys[idx].item()
+    return key if self._payloads is None else (key, int(self._payloads[idx]))
+
+  def extract_min(self):
+    """Extract the min key, or (key, payload) if the heap has payloads"""
+    if self._size == 0:
+      raise Exception("No value in heap to pop.")
+    min_item = self._item(0)
+    self._size -= 1
+    if self._size > 0:
+      self._keys[0] = self._keys[self._size]
+      if self._payloads is not None:
+        self._payloads[0] = self._payloads[self._size]
+      self._sift_down(0)
+    return min_item
+
+  def nsmallest(self, k: int):
+    """Return the k smallest keys in ascending order, without removing them
+
+    :return: ndarray of keys, or (keys, payloads) if the heap has payloads
+    """
+    k = max(0, min(k, self._size))
+    if k > self.PARTITION_THRESHOLD:
+      idxs = np.argpartition(self._keys[:self._size], k - 1)[:k] if k < self._size else np.arange(self._size)
+      idxs = idxs[np.argsort(self._keys[idxs], kind='stable')]
+    else:
+      # Best-first walk of the heap: the next smallest key is always in the frontier
+      keys = self._keys
+      frontier = [(keys[0].item(), 0)] if k else []
+      found = []
+      while len(found) < k:
+        (_, idx) = heapq.heappop(frontier)
+        found.append(idx)
+        for child_idx in (2 * idx + 1, 2 * idx + 2):
+          if child_idx < self._size:
+            heapq.heappush(frontier, (keys[child_idx].item(), child_idx))
+      idxs = np.array(found, dtype=np.int64)
+
+    if self._payloads is None:
+      return self._keys[idxs]
+    return (self._keys[idxs], self._payloads[idxs])
+
+  def pop_many(self, k: int):
+    """Extract the k smallest keys in ascending order
+
+    :return: ndarray of keys, or (keys, payloads) if the heap has payloads
+    """
+    if k < 0:
+      raise ValueError("Number of values to pop must be non-negative.")
+    if k > self._size:
+      raise Exception(f"Cannot pop {k} values from a heap of size {self._size}.")
+
+    if k <= self.PARTITION_THRESHOLD:
+      items = [self.extract_min() for _ in range(k)]
+      if self._payloads is None:
+        return np.array(items, dtype=self.dtype)
+      return (np.array([item[0] for item in items], dtype=self.dtype),
+              np.array([item[1] for item in items], dtype=np.int64))
+
+    # Partition the live keys so the k smallest come first, then sort them and re-heapify the rest
+    order = np.argpartition(self._keys[:self._size], k - 1) if k < self._size else np.arange(self._size)
+    order[:k] = order[:k][np.argsort(self._keys[order[:k]], kind='stable')]
+    keys = self._keys[:self._size][order]
+    self._keys[:self._size] = keys
+    if self._payloads is not None:
+      payloads = self._payloads[:self._size][order]
+      self._payloads[:self._size] = payloads
+
+    remaining = self._size - k
+    self._keys[:remaining] = keys[k:]
+    if self._payloads is not None:
+      self._payloads[:remaining] = payloads[k:]
+    self._size = remaining
+    self._heapify()
+
+    if self._payloads is None:
+      return keys[:k]
+    return (keys[:k], payloads[:k])
+
+def benchmark_construction(size: int = 1000000, seed: int = 0) -> Dict[str, float]:
+  """Time building a MinHeap with one insert per value against heapify
+
+  :return: Seconds taken by each approach
+  """
+  rng = random.Random(seed)
+  values = [rng.random() for _ in range(size)]
+  timings: Dict[str, float] = {}
+
+  tic = time.perf_counter()
+  one_by_one = MinHeap([])
+  for value in values:
+    one_by_one.insert(value)
+  timings['insert_loop'] = time.perf_counter() - tic
+
+  tic = time.perf_counter()
+  MinHeap(values)
+  timings['heapify'] = time.perf_counter() - tic
+
+  tic = time.perf_counter()
+  bulk = MinHeap([])
+  bulk.push_many(values)
+  timings['push_many'] = time.perf_counter() - tic
+  return timings
+
+def benchmark_numeric_heap(size: int = 1000000, pops: int = 10000, k: int = 10000,
+                           seed: int = 0) -> Dict[str, float]:
+  """Time NumericMinHeap against MinHeap and heapq on random float64 keys
+
+  Measures bulk load, `pops` single extractions and a k-smallest query, plus
+  the bytes used per entry by each container.
+
+  :return: Seconds taken per operation and bytes per entry, keyed '<container>_<operation>'
+  """
+  rng = np.random.default_rng(seed)
+  keys = rng.random(size)
+  values = keys.tolist()
+  timings: Dict[str, float] = {}
+
+  tic = time.perf_counter()
+  numeric_heap = NumericMinHeap(dtype=np.float64)
+  numeric_heap.push_many(keys)
+  timings['numeric_push_many'] = time.perf_counter() - tic
+  tic = time.perf_counter()
+  numeric_smallest = numeric_heap.nsmallest(k)
+  timings['numeric_nsmallest'] = time.perf_counter() - tic
+  tic = time.perf_counter()
+  for _ in range(pops):
+    numeric_heap.extract_min()
+  timings['numeric_extract_min'] = time.perf_counter() - tic
+  timings['numeric_bytes_per_entry'] = numeric_heap.nbytes / len(numeric_heap._keys)
+
+  tic = time.perf_counter()
+  min_heap = MinHeap(values)
+  timings['minheap_heapify'] = time.perf_counter() - tic
+  tic = time.perf_counter()
+  for _ in range(pops):
+    min_heap.extract_min()
+  timings['minheap_extract_min'] = time.perf_counter() - tic
+  # List slot plus one boxed float per entry
+  timings['minheap_bytes_per_entry'] = (sys.getsizeof(min_heap.values) / max(len(min_heap), 1) +
+                                        sys.getsizeof(0.5))
+
+  tic = time.perf_counter()
+  heapq_heap = list(values)
+  heapq.heapify(heapq_heap)
+  timings['heapq_heapify'] = time.perf_counter() - tic
+  tic = time.perf_counter()
+  heapq_smallest = heapq.nsmallest(k, heapq_heap)
+  timings['heapq_nsmallest'] = time.perf_counter() - tic
+  tic = time.perf_counter()
+  for _ in range(pops):
+    heapq.heappop(heapq_heap)
+  timings['heapq_extract_min'] = time.perf_counter() - tic
+
+  assert numeric_smallest.tolist() == heapq_smallest
+  return timings
+
 @pytest.mark.parametrize("insertion_values, expected_min_values",
   [pytest.param([1, 4, 8, 23, 6, 4, 9, 9, 9], [1, 4, 4, 6]),
    pytest.param([], [1, 4, 4, 6], marks=pytest.mark.xfail(reason="Cannot extract a min value from an empty min heap")),
@@ -120,6 +713,134 @@ def test_min_heap(insertion_values, expected_min_values):
   for i in expected_min_values:
     assert minheap.extract_min() == i
 
+@pytest.mark.parametrize("seed", range(5))
+def test_heapify_and_bulk_operations(seed):
+  rng = random.Random(seed)
+  values = [rng.randint(-50, 50) for _ in range(rng.randint(0, 200))]
+  minheap = MinHeap(values)
+  assert minheap.pop_many(len(values) // 2) == sorted(values)[:len(values) // 2]
+
+  extra = [rng.randint(-50, 50) for _ in range(rng.randint(0, 300))]
+  minheap.push_many(extra)
+  minheap.push_many(extra[:3])
+  remaining = sorted(sorted(values)[len(values) // 2:] + extra + extra[:3])
+  assert minheap.pop_many(len(minheap)) == remaining
+  assert len(minheap) == 0
+
+def test_pushpop_and_replace():
+  minheap = MinHeap([5, 3, 8])
+  assert minheap.pushpop(1) == 1
+  assert minheap.pushpop(4) == 3
+  assert minheap.replace(0) == 4
+  assert minheap.pop_many(3) == [0, 5, 8]
+  assert minheap.pushpop(7) == 7
+  with pytest.raises(Exception):
+    minheap.replace(7)
+  with pytest.raises(Exception):
+    minheap.pop_many(1)
+
+def test_min_heap_instrumentation():
+  rng = random.Random(0)
+  values = [rng.randrange(1000) for _ in range(200)]
+  (heap, plain) = (MinHeap([]), MinHeap([]))
+  with instrumented(heap) as stats:
+    for value in values:
+      heap.insert(value)
+      plain.insert(value)
+    assert heap.pop_many(50) == plain.pop_many(50)
+  counters = stats.snapshot()['counters']
+  assert counters['min_heap.sifts'] == 250
+  assert 0 < counters['min_heap.swaps'] <= counters['min_heap.comparisons']
+  assert stats.maxima['min_heap.max_sift_depth'] <= math.ceil(math.log2(len(values)))
+  assert stats.timers['min_heap.pop_many']['calls'] == 1
+
+  # Disabled again on exit, and other heaps were never counted
+  heap.insert(-1)
+  assert stats.counters['min_heap.sifts'] == 250
+
+  indexed = IndexedMinHeap([5, 3, 8])
+  indexed_stats = instrument(indexed)
+  indexed.decrease_key(2, 1)
+  assert indexed.pop_many(3) == [1, 3, 5]
+  assert indexed_stats.counters == {}
+  assert set(indexed_stats.timers) == {'indexed_min_heap.decrease_key', 'indexed_min_heap.pop_many'}
+
+def test_min_heap_tuples():
+  minheap = MinHeap([(2, 'b'), (1, 'z'), (2, 'a')])
+  assert minheap.pop_many(3) == [(1, 'z'), (2, 'a'), (2, 'b')]
+
+def test_indexed_min_heap_decrease_key_and_remove():
+  minheap = IndexedMinHeap([10, 8, 4])
+  assert all(minheap.contains(handle) for handle in (0, 1, 2))
+  handle = minheap.insert(6)
+  minheap.decrease_key(0, 1)
+  assert minheap.remove(2) == 4
+  assert not minheap.contains(2)
+  assert handle in minheap
+  with pytest.raises(ValueError):
+    minheap.decrease_key(1, 9)
+  with pytest.raises(KeyError):
+    minheap.remove(2)
+  assert minheap.pop_many(3) == [1, 6, 8]
+  assert len(minheap) == 0
+
+@pytest.mark.parametrize("seed", range(5))
+def test_indexed_min_heap_matches_reference(seed):
+  rng = random.Random(seed)
+  minheap = IndexedMinHeap([])
+  reference: Dict[str, Tuple[int, str]] = {}
+  for step in range(500):
+    action = rng.random()
+    if action < 0.4 or not reference:
+      name = f"n{step}"
+      reference[name] = (rng.randint(0, 100), name)
+      assert minheap.insert(reference[name], handle=name) == name
+    elif action < 0.7:
+      name = rng.choice(sorted(reference))
+      reference[name] = (reference[name][0] - rng.randint(0, 10), name)
+      minheap.decrease_key(name, reference[name])
+    elif action < 0.85:
+      name = rng.choice(sorted(reference))
+      assert minheap.remove(name) == reference.pop(name)
+    else:
+      (name, value) = minheap.extract_min_item()
+      assert value == min(reference.values())
+      assert reference.pop(name) == value
+    assert len(minheap) == len(reference)
+  assert minheap.pop_many(len(reference)) == sorted(reference.values())
+
+@pytest.mark.parametrize("dtype", [np.int64, np.float64])
+@pytest.mark.parametrize("seed", range(3))
+def test_numeric_min_heap_matches_sorted(dtype, seed):
+  rng = np.random.default_rng(seed)
+  keys = rng.integers(-1000, 1000, size=int(rng.integers(1, 2000))).astype(dtype)
+  numeric_heap = NumericMinHeap(keys[:7], dtype=dtype, capacity=2)
+  numeric_heap.push_many(keys[7:])
+  numeric_heap.insert(dtype(5))
+  expected = np.sort(np.append(keys, dtype(5)))
+  for k in (0, 1, 10, 100, 5000):
+    assert numeric_heap.nsmallest(k).tolist() == expected[:k].tolist()
+  assert numeric_heap.pop_many(3).tolist() == expected[:3].tolist()
+  assert numeric_heap.pop_many(200).tolist() == expected[3:203].tolist()
+  popped = [numeric_heap.extract_min() for _ in range(len(numeric_heap))]
+  assert popped == expected[203:].tolist()
+
+def test_numeric_min_heap_payloads():
+  numeric_heap = NumericMinHeap(dtype=np.int64, payload=True)
+  keys = np.arange(500, 0, -1, dtype=np.int64)
+  numeric_heap.push_many(keys, payloads=keys * 10)
+  numeric_heap.insert(0, payload=-1)
+  assert numeric_heap.peek() == (0, -1)
+  (small_keys, small_payloads) = numeric_heap.nsmallest(3)
+  assert small_keys.tolist() == [0, 1, 2] and small_payloads.tolist() == [-1, 10, 20]
+  (popped_keys, popped_payloads) = numeric_heap.pop_many(100)
+  assert (popped_payloads[1:] == popped_keys[1:] * 10).all()
+  assert numeric_heap.extract_min() == (100, 1000)
+  with pytest.raises(ValueError):
+    numeric_heap.insert(3)
+  with pytest.raises(ValueError):
+    NumericMinHeap(dtype=np.float32)
+
 if (__name__ == '__main__'):
   pytest.main(["--durations", "0"])
 
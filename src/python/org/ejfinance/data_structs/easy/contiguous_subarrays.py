@@ -1,17 +1,23 @@
 import re
 import math
-from typing import List
+import time
+from typing import Dict, Iterable, List, Optional
 
 import pandas as pd
 import numpy as np
 import pytest
 
+from ..instrumentation import active_stats, instrumented, timed_function
+
 def _count_subarrays(arr: List[int]) -> np.ndarray:
   # Count number of forward contiguous subarrays
+  stats = active_stats()
   count_subarrays = np.zeros(len(arr), dtype=np.int32)
   for idx, val in enumerate(arr):
     for j in range(idx, len(arr)):
-      print(f"subarray under test for start value {val}: {arr[idx:j]}")
+      if stats is not None:
+        stats.add('contiguous_subarrays.subarrays_checked')
+        stats.add('contiguous_subarrays.comparisons', j - idx + 1)
       if all([i <= val for i in arr[idx:j+1]]):
         count_subarrays[idx] += 1
       else:
@@ -52,12 +58,173 @@ def count_contiguous_subarrays(arr: List[int]) -> List[int]:
   :return: Integer number of valid subarrays in input"""
 
   count_forward_subarrays = _count_subarrays(arr)
-  print(f"count_forward_subarrays = {count_forward_subarrays}")
   count_backward_subarrays = list(reversed(_count_subarrays(list(reversed(arr)))))
 
   total_count = (count_forward_subarrays + count_backward_subarrays - 1)
   return total_count.tolist() 
 
+def _next_greater_idxs(values: list, offsets: Optional[List[int]] = None) -> List[int]:
+  # Monotonic stack of indexes whose values are non-increasing. A value pops every
+  # smaller value before it, and is the first strictly greater value after them.
+  # With offsets, values is several series back to back, and series i spans
+  # [offsets[i], offsets[i+1]). A value without a greater one gets its series end
+  if offsets is None:
+    offsets = [0, len(values)]
+  next_greater = [0] * len(values)
+  for (start, end) in zip(offsets[:-1], offsets[1:]):
+    stack: List[int] = []
+    for idx in range(start, end):
+      val = values[idx]
+      while stack and values[stack[-1]] < val:
+        next_greater[stack.pop()] = idx
+      stack.append(idx)
+    for idx in stack:
+      next_greater[idx] = end
+  return next_greater
+
+def _count_from_greater_idxs(values: list, offsets: List[int]) -> np.ndarray:
+  size = len(values)
+  stats = active_stats()
+  if stats is not None:
+    stats.add('contiguous_subarrays.elements', size)
+  next_greater = np.array(_next_greater_idxs(values, offsets), dtype=np.int64)
+  # Reversing the concatenation reverses every series and the order of the series
+  reversed_offsets = [size - offset for offset in reversed(offsets)]
+  prev_greater = (size - 1) - np.array(_next_greater_idxs(values[::-1], reversed_offsets),
+                                       dtype=np.int64)[::-1]
+  return next_greater - prev_greater - 1
+
+@timed_function('contiguous_subarrays.linear')
+def count_contiguous_subarrays_linear(arr) -> np.ndarray:
+  """Determine number of contiguous subarrays in O(n)
+
+  Same problem and output as count_contiguous_subarrays, which is kept as the
+  reference implementation.
+
+  :param arr: A list or 1-D array of N numbers
+  :return: np.ndarray (int64) of the number of valid subarrays per index
+
+  Approach:
+    1) Subarrays starting at i where arr[i] is the max extend up to (not including)
+       the next strictly greater element, found for every i with one monotonic stack
+       pass. Same for subarrays ending at i, using the previous strictly greater
+       element (a pass over the reversed input)
+    2) count[i] = (next_greater[i] - i) + (i - prev_greater[i]) - 1, where the -1
+       removes [arr[i]] which is counted in both directions
+    Time complexity: O(n)
+    Space complexity: O(n)
+  """
+  values = arr.tolist() if isinstance(arr, np.ndarray) else list(arr)
+  return _count_from_greater_idxs(values, [0, len(values)])
+
+@timed_function('contiguous_subarrays.batch')
+def count_contiguous_subarrays_batch(series, offsets=None) -> np.ndarray:
+  """Determine number of contiguous subarrays for many independent series in one call
+
+  :param series: 2-D array with one series per row, or (with offsets) a 1-D array of
+    all series back to back
+  :param offsets: For ragged series, N+1 increasing indexes into series. Series i is
+    series[offsets[i]:offsets[i+1]]
+  :return: Counts with the same shape as series (per row for 2-D input, flat and
+    aligned with series for ragged input)
+
+  Approach:
+    1) Flatten to one list and run the monotonic stack passes of
+       count_contiguous_subarrays_linear once over it, resetting the stack at
+       every series boundary. There is no per-series Python call or array
+       allocation, which dominates for many short series
+  """
+  series = np.asarray(series)
+  if offsets is None:
+    if series.ndim != 2:
+      raise ValueError("Expected a 2-D array, or a 1-D array with offsets.")
+    (rows, columns) = series.shape
+    offsets = list(range(0, rows * columns + 1, columns)) if columns else [0] * (rows + 1)
+    return _count_from_greater_idxs(series.ravel().tolist(), offsets).reshape(series.shape)
+
+  offsets = np.asarray(offsets, dtype=np.int64)
+  if (series.ndim != 1 or offsets.ndim != 1 or len(offsets) == 0 or offsets[0] != 0 or
+      offsets[-1] != len(series) or (np.diff(offsets) < 0).any()):
+    raise ValueError("Offsets must increase from 0 to len(series) over a 1-D series.")
+  return _count_from_greater_idxs(series.tolist(), offsets.tolist())
+
+class ContiguousSubarrayCounter:
+  """Contiguous subarray counts for a series that grows one value at a time
+
+  Conditions:
+    1) append(value) is amortized O(1)
+    2) Backward counts (subarrays ending at i where arr[i] is the max) never change
+       once a value is appended, so they are final on append
+    3) Forward counts of earlier values can still grow, so they are resolved when counts()
+       is called, in O(n) vectorized
+
+  Approach:
+    1) Keep the monotonic stack of count_contiguous_subarrays_linear between appends.
+       Each entry is (value, index, previous strictly greater index). Popping the smaller
+       values gives them their next greater index (the new value)
+    2) If the new top is equal to the new value, the previous strictly greater index is
+       shared with it, else it is the top's index (-1 if the stack is empty)
+  """
+  def __init__(self, init_values: Iterable = ()):
+    self.backward_counts: List[int] = []
+    self._next_greater: List[int] = []
+    self._stack: List[tuple] = []
+    for value in init_values:
+      self.append(value)
+
+  def __len__(self) -> int:
+    return len(self.backward_counts)
+
+  def append(self, value) -> int:
+    """Append value and return its backward count"""
+    idx = len(self.backward_counts)
+    stack = self._stack
+    while stack and stack[-1][0] < value:
+      self._next_greater[stack.pop()[1]] = idx
+    if not stack:
+      prev_greater = -1
+    elif stack[-1][0] == value:
+      prev_greater = stack[-1][2]
+    else:
+      prev_greater = stack[-1][1]
+    stack.append((value, idx, prev_greater))
+
+    # -1 marks a next greater value not seen yet
+    self._next_greater.append(-1)
+    self.backward_counts.append(idx - prev_greater)
+    return idx - prev_greater
+
+  def forward_counts(self) -> np.ndarray:
+    size = len(self._next_greater)
+    next_greater = np.array(self._next_greater, dtype=np.int64)
+    next_greater[next_greater < 0] = size
+    return next_greater - np.arange(size, dtype=np.int64)
+
+  def counts(self) -> np.ndarray:
+    """Counts for the series so far, as count_contiguous_subarrays_linear would return"""
+    return self.forward_counts() + np.array(self.backward_counts, dtype=np.int64) - 1
+
+def benchmark_count_contiguous_subarrays(sizes: Iterable[int] = (10**2, 10**3, 10**4, 10**5, 10**6, 10**7),
+                                         reference_max_size: int = 10**3,
+                                         seed: int = 0) -> Dict[int, Dict[str, float]]:
+  """Time the linear implementation across input sizes, and the reference on small ones
+
+  :return: Seconds taken per input size and implementation
+  """
+  rng = np.random.default_rng(seed)
+  timings: Dict[int, Dict[str, float]] = {}
+  for size in sizes:
+    arr = rng.integers(0, 1000, size=size)
+    timings[size] = {}
+    tic = time.perf_counter()
+    count_contiguous_subarrays_linear(arr)
+    timings[size]['linear'] = time.perf_counter() - tic
+    if size <= reference_max_size:
+      tic = time.perf_counter()
+      count_contiguous_subarrays(arr.tolist())
+      timings[size]['reference'] = time.perf_counter() - tic
+  return timings
+
 @pytest.mark.parametrize("test_input, expected_output",
   [pytest.param([3, 4, 1, 6, 2], [1, 3, 1, 5, 1]),
    pytest.param([2, 4, 7, 1, 5, 3], [1, 2, 6, 1, 3, 1]),
@@ -66,5 +233,62 @@ def test_count_contiguous_subarrays(test_input: List[int],
                               expected_output: List[int]):
   assert count_contiguous_subarrays(test_input) == expected_output
 
+@pytest.mark.parametrize("test_input, expected_output",
+  [pytest.param([3, 4, 1, 6, 2], [1, 3, 1, 5, 1]),
+   pytest.param([2, 4, 7, 1, 5, 3], [1, 2, 6, 1, 3, 1]),
+   pytest.param([2, 2, 1, 2, 2], [5, 5, 1, 5, 5]),
+   pytest.param([], [])])
+def test_count_contiguous_subarrays_linear(test_input: List[int],
+                                          expected_output: List[int]):
+  result = count_contiguous_subarrays_linear(test_input)
+  assert isinstance(result, np.ndarray)
+  assert result.tolist() == expected_output
+
+@pytest.mark.parametrize("seed", range(20))
+def test_count_contiguous_subarrays_linear_matches_reference(seed):
+  rng = np.random.default_rng(seed)
+  arr = rng.integers(0, 5, size=int(rng.integers(1, 40))).tolist()
+  assert count_contiguous_subarrays_linear(arr).tolist() == count_contiguous_subarrays(arr)
+
+def test_count_contiguous_subarrays_instrumentation(capsys):
+  with instrumented() as stats:
+    assert count_contiguous_subarrays([3, 4, 1]) == [1, 3, 1]
+    count_contiguous_subarrays_linear([3, 4, 1])
+  # Forward: [3], [3, 4] | [4], [4, 1] | [1]. Backward: [1], [1, 4] | [4], [4, 3] | [3]
+  assert stats.counters['contiguous_subarrays.subarrays_checked'] == 10
+  assert stats.counters['contiguous_subarrays.comparisons'] == 14
+  assert stats.counters['contiguous_subarrays.elements'] == 3
+  assert stats.timers['contiguous_subarrays.linear']['calls'] == 1
+  assert capsys.readouterr().out == ''
+
+def test_count_contiguous_subarrays_batch():
+  rng = np.random.default_rng(0)
+  rows = rng.integers(0, 6, size=(50, 17))
+  expected = np.stack([count_contiguous_subarrays_linear(row) for row in rows])
+  assert (count_contiguous_subarrays_batch(rows) == expected).all()
+  assert count_contiguous_subarrays_batch(np.empty((3, 0))).shape == (3, 0)
+
+  ragged = [rng.integers(0, 6, size=int(size)).tolist() for size in rng.integers(0, 12, size=40)]
+  offsets = np.cumsum([0] + [len(row) for row in ragged])
+  flat = np.concatenate([np.asarray(row, dtype=np.int64) for row in ragged])
+  result = count_contiguous_subarrays_batch(flat, offsets)
+  for (row, start, end) in zip(ragged, offsets[:-1], offsets[1:]):
+    assert result[start:end].tolist() == count_contiguous_subarrays_linear(row).tolist()
+  with pytest.raises(ValueError):
+    count_contiguous_subarrays_batch(flat, [0, len(flat) + 1])
+  with pytest.raises(ValueError):
+    count_contiguous_subarrays_batch(flat)
+
+def test_contiguous_subarray_counter_matches_linear():
+  rng = np.random.default_rng(1)
+  values = rng.integers(0, 5, size=200).tolist()
+  counter = ContiguousSubarrayCounter(values[:3])
+  for idx in range(3, len(values)):
+    counter.append(values[idx])
+    if idx % 37 == 0:
+      assert counter.counts().tolist() == count_contiguous_subarrays_linear(values[:idx+1]).tolist()
+  assert counter.counts().tolist() == count_contiguous_subarrays_linear(values).tolist()
+  assert ContiguousSubarrayCounter([3, 4, 1, 6, 2]).backward_counts == [1, 2, 1, 4, 1]
+
 if (__name__ == '__main__'):
   pytest.main(["--durations", "0"])
\ No newline at end of file
@@ -1,36 +1,238 @@
 
 # from dataclasses import dataclass
 # from collections.abc import Iterable
-from typing import Iterable
+import gc
+import time
+import tracemalloc
+from array import array
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional
 
 import pytest
 
+from ..instrumentation import active_stats, instrumented
+
 # Create classes required to construct a linked list data structure
 # If able, we could just use the list() built-in in Python 3, or deque
-# This implementation could be improved by annotating it as a dataclass
+# Node uses __slots__ rather than being a dataclass, so each node has no __dict__
 class Node:
+  __slots__ = ('data', 'next')
+
   def __init__(self, data: int):
     self.data = data
     self.next: Node = None
 
 class LinkedList:
+  # instrument(llist) counts nodes allocated, appended and removed for that list.
+  # Traversals are counted by the functions that walk the list
+  _INSTRUMENTED = {'append': '_counted_append', 'extend': '_counted_extend', 'popleft': '_counted_popleft'}
+
   def __init__(self):
     self.head = None
+    self.tail = None
     self.size = 0
 
-  def append(self, nodes: Iterable[Node]):
-    for idx, node in enumerate(nodes):
-      if idx == 0:
-        n: Node = self.head
-        while (n is not None and n.next != None):
-          n = n.next
+  def __len__(self) -> int:
+    return self.size
 
-      if n == None:
+  def __iter__(self) -> Iterator:
+    n: Node = self.head
+    while n is not None:
+      yield n.data
+      n = n.next
+
+  def append(self, nodes: Iterable[Node]):
+    # The tail pointer makes each append O(1), instead of walking from head
+    tail: Node = self.tail
+    count = 0
+    for node in nodes:
+      if tail is None:
         self.head = node
       else:
-        n.next = node
-      n = node
-      self.size += 1
+        tail.next = node
+      tail = node
+      count += 1
+    self.tail = tail
+    self.size += count
+
+  def extend(self, values: Iterable):
+    """Append one new node per value"""
+    self.append(Node(val) for val in values)
+
+  def popleft(self):
+    """Remove the head node and return its data"""
+    if self.head is None:
+      raise IndexError("pop from an empty linked list")
+    node: Node = self.head
+    self.head = node.next
+    if self.head is None:
+      self.tail = None
+    self.size -= 1
+    return node.data
+
+  def _counted_append(self, nodes: Iterable[Node]):
+    size = self.size
+    LinkedList.append(self, nodes)
+    self._stats.add('linked_list.nodes_appended', self.size - size)
+    self._stats.record_max('linked_list.max_size', self.size)
+
+  def _counted_extend(self, values: Iterable):
+    size = self.size
+    LinkedList.extend(self, values)
+    self._stats.add('linked_list.nodes_allocated', self.size - size)
+
+  def _counted_popleft(self):
+    self._stats.add('linked_list.nodes_removed')
+    return LinkedList.popleft(self)
+
+class PooledLinkedList:
+  """Linked list whose nodes live in preallocated typed arrays (struct of arrays)
+
+  Conditions:
+    1) Same API as LinkedList (append, extend, popleft, iteration, len, size),
+       so return_kth_to_end_node_data works on both
+    2) Node data is numeric, stored with an array module typecode ('q' int64 by default)
+    3) No Python object per node, so nothing for the garbage collector to traverse
+
+  Approach:
+    - A node is an integer slot index. self._data[i] and self._next[i] hold its
+      data and the slot of the next node (NULL = -1)
+    - Free slots are chained through self._next into a free list, so slots freed
+      by popleft are reused before the arrays grow
+    - When no slot is free, both arrays double in size
+  """
+  NULL = -1
+
+  def __init__(self, typecode: str = 'q', capacity: int = 16):
+    self.typecode = typecode
+    self._data = array(typecode)
+    self._next = array('q')
+    self._free = self.NULL
+    self.head = self.NULL
+    self.tail = self.NULL
+    self.size = 0
+    self._grow(max(capacity, 1))
+
+  def _grow(self, extra: int):
+    # Thread the new slots onto the free list
+    start = len(self._next)
+    self._data.extend(array(self.typecode, bytes(extra * self._data.itemsize)))
+    self._next.extend(range(start + 1, start + extra + 1))
+    self._next[-1] = self._free
+    self._free = start
+
+  def __len__(self) -> int:
+    return self.size
+
+  def __iter__(self) -> Iterator:
+    data, next_slots = self._data, self._next
+    slot = self.head
+    while slot != self.NULL:
+      yield data[slot]
+      slot = next_slots[slot]
+
+  def append(self, nodes: Iterable[Node]):
+    """Append the data of LinkedList style nodes (the Node objects are not kept)"""
+    self.extend(node.data for node in nodes)
+
+  def extend(self, values: Iterable):
+    """Append one new node per value"""
+    data, next_slots = self._data, self._next
+    tail, free, count = self.tail, self._free, 0
+    try:
+      for val in values:
+        if free == self.NULL:
+          self._free = free
+          self._grow(len(next_slots))
+          data, next_slots, free = self._data, self._next, self._free
+        slot = free
+        # A value the typecode rejects raises here, before the slot leaves the free list
+        data[slot] = val
+        free = next_slots[slot]
+        next_slots[slot] = self.NULL
+        if tail == self.NULL:
+          self.head = slot
+        else:
+          next_slots[tail] = slot
+        tail = slot
+        count += 1
+    finally:
+      # Values linked in before a failure stay in the list
+      self.tail, self._free = tail, free
+      self.size += count
+
+  def popleft(self):
+    """Remove the head node and return its data"""
+    if self.head == self.NULL:
+      raise IndexError("pop from an empty linked list")
+    slot = self.head
+    self.head = self._next[slot]
+    if self.head == self.NULL:
+      self.tail = self.NULL
+    self._next[slot] = self._free
+    self._free = slot
+    self.size -= 1
+    return self._data[slot]
+
+  @property
+  def capacity(self) -> int:
+    return len(self._next)
+
+def benchmark_append(total_values: int = 10000000, chunk_size: int = 100000) -> Dict[str, float]:
+  """Time appending total_values to a LinkedList in chunks, and capture peak memory
+
+  The timed run and the memory run are separate, since tracing slows down every allocation.
+
+  :return: Seconds taken, and peak traced bytes (total and per node)
+  """
+  def build() -> LinkedList:
+    llist = LinkedList()
+    for start in range(0, total_values, chunk_size):
+      llist.extend(range(start, min(start + chunk_size, total_values)))
+    return llist
+
+  tic = time.perf_counter()
+  llist = build()
+  results: Dict[str, float] = {'seconds': time.perf_counter() - tic}
+  assert len(llist) == total_values
+  del llist
+
+  tracemalloc.start()
+  llist = build()
+  results['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  # Kept alive until the peak is read, so the list is not freed while tracing
+  del llist
+  results['peak_bytes_per_node'] = results['peak_bytes'] / total_values
+  return results
+
+def benchmark_pooled_vs_objects(total_values: int = 5000000) -> Dict[str, float]:
+  """Compare LinkedList and PooledLinkedList build time, full GC pause and peak memory
+
+  :return: Seconds to build, seconds for a gc.collect() with the list alive, and
+           peak traced bytes per node, keyed '<layout>_<metric>'
+  """
+  results: Dict[str, float] = {}
+  for (name, factory) in (('objects', LinkedList), ('pooled', PooledLinkedList)):
+    gc.collect()
+    tic = time.perf_counter()
+    llist = factory()
+    llist.extend(range(total_values))
+    results[f'{name}_build_seconds'] = time.perf_counter() - tic
+
+    tic = time.perf_counter()
+    gc.collect()
+    results[f'{name}_gc_seconds'] = time.perf_counter() - tic
+    del llist
+    gc.collect()
+
+    tracemalloc.start()
+    llist = factory()
+    llist.extend(range(total_values))
+    results[f'{name}_peak_bytes_per_node'] = tracemalloc.get_traced_memory()[1] / total_values
+    tracemalloc.stop()
+    del llist
+  return results
 
 def return_kth_to_end_node_data(llist: LinkedList, k: int) -> int:
   """Return the data stored in the kth to last linked list node
@@ -43,7 +245,7 @@ def return_kth_to_end_node_data(llist: LinkedList, k: int) -> int:
     in a linked list data structure. 
 
   Conditions/Assumptions: 
-    1) Using the LinkedList class as defined above
+    1) Using the LinkedList or PooledLinkedList classes as defined above
   
   Examples:
     1) Append elements in [1, 2, 3, 4, 5] -> return 3 if k=2
@@ -54,28 +256,63 @@ def return_kth_to_end_node_data(llist: LinkedList, k: int) -> int:
     2) Move each runner forward one node until the ahead runner hits the end of the list
     3) Retrieve the value at the lagging runner
   """
-  print(f"llist size = {llist.size}")
-
-  if not llist:
+  if llist is None:
     raise ValueError("Linked list object reference is None")
+  if k < 0:
+    raise ValueError("Offset from the end must be non-negative.")
+
+  # Stats of an instrumented list, else of an instrumented() block
+  stats = getattr(llist, '_stats', None) or active_stats()
+  if stats is not None:
+    stats.record_max('linked_list.max_size', llist.size)
+    # The runners visit size and size - k nodes
+    stats.add('linked_list.nodes_visited', 2 * llist.size - k if llist.size >= k + 1 else 0)
 
   # Return None if the linked list does not contain at least k+1 Nodes
   if (llist.size < k+1):
     return None
 
-  # Set up two runners
-  run_ahead = llist.head
-  run_behind = llist.head
+  # Set up two runners. They are iterators over the node data, so the same
+  # traversal works for both linked list layouts
+  run_ahead = iter(llist)
+  run_behind = iter(llist)
 
-  # Traverse k items with the runner in the lead
-  for i in range(k):
-    run_ahead = run_ahead.next
+  # Traverse k+1 items with the runner in the lead
+  for i in range(k+1):
+    next(run_ahead)
 
-  while (run_ahead.next != None):
-    run_ahead = run_ahead.next
-    run_behind = run_behind.next
+  behind_data = next(run_behind)
+  for _ in run_ahead:
+    behind_data = next(run_behind)
   
-  return run_behind.data
+  return behind_data
+
+def return_kth_to_end_data_many(values: Iterable, ks: Iterable[int]) -> List[Optional[int]]:
+  """Return the data k nodes from the end for several k, in a single pass
+
+  :param values: LinkedList, PooledLinkedList or any iterable (length may be unknown)
+  :param ks: Offsets from the end (0 means the last value)
+  :return: One value per k, in the order of ks (None where the input is shorter than k+1)
+
+  Examples:
+    1) values [1, 2, 3, 4, 5], ks [0, 2, 9] -> [5, 3, None]
+
+  Approach:
+    1) Keep the last max(ks)+1 values in a bounded ring buffer (deque with maxlen)
+       while iterating once over the input. Nothing else is stored and nothing is
+       printed, and the input's size attribute is not relied on
+    2) After the pass, the value k from the end is buffer[-1-k]
+    Time complexity: O(n + len(ks))
+    Space complexity: O(max(ks))
+  """
+  ks = list(ks)
+  if any(k < 0 for k in ks):
+    raise ValueError("Offsets from the end must be non-negative.")
+  if not ks:
+    return []
+
+  tail_values = deque(values, maxlen=max(ks) + 1)
+  return [tail_values[-1-k] if k < len(tail_values) else None for k in ks]
 
 llist = LinkedList()
 llist.append([Node(val) for val in range(20)])
@@ -86,6 +323,91 @@ llist.append([Node(val) for val in range(20)])
 def test_multiply_all_except_self_on_garbage(test_input, k, expected):
   assert return_kth_to_end_node_data(test_input, k) == expected, 'Test case failed.'
 
+def test_append_extend_iterate_and_popleft():
+  llist = LinkedList()
+  llist.append([Node(1), Node(2)])
+  llist.extend(range(3, 6))
+  llist.append([Node(6)])
+  assert list(llist) == [1, 2, 3, 4, 5, 6]
+  assert len(llist) == 6
+  assert return_kth_to_end_node_data(llist, 0) == 6
+  with pytest.raises(ValueError):
+    return_kth_to_end_node_data(llist, -1)
+  assert [llist.popleft() for _ in range(6)] == [1, 2, 3, 4, 5, 6]
+  assert llist.head is None and llist.tail is None and len(llist) == 0
+  with pytest.raises(IndexError):
+    llist.popleft()
+  llist.extend([7])
+  assert list(llist) == [7]
+  assert not hasattr(llist.head, '__dict__')
+
+def test_linked_list_instrumentation(capsys):
+  (counted, plain) = (LinkedList(), LinkedList())
+  with instrumented(counted) as stats:
+    counted.extend(range(10))
+    plain.extend(range(10))
+    counted.append([Node(10)])
+    assert return_kth_to_end_node_data(counted, 3) == 7
+    assert return_kth_to_end_node_data(plain, 3) == 6
+    assert return_kth_to_end_node_data(counted, 20) is None
+    counted.popleft()
+  assert stats.counters == {'linked_list.nodes_allocated': 10, 'linked_list.nodes_appended': 11,
+                            'linked_list.nodes_visited': (2 * 11 - 3) + (2 * 10 - 3), 'linked_list.nodes_removed': 1}
+  assert stats.maxima == {'linked_list.max_size': 11}
+  assert capsys.readouterr().out == ''
+  counted.extend(range(5))
+  assert stats.counters['linked_list.nodes_allocated'] == 10
+
+def test_pooled_linked_list_matches_linked_list():
+  llist, pooled = LinkedList(), PooledLinkedList(capacity=2)
+  for target in (llist, pooled):
+    target.append([Node(1), Node(2)])
+    target.extend(range(3, 40))
+  assert list(pooled) == list(llist)
+  for k in (0, 5, 38, 39):
+    assert return_kth_to_end_node_data(pooled, k) == return_kth_to_end_node_data(llist, k)
+
+  # Freed slots are reused before growing
+  capacity = pooled.capacity
+  assert [pooled.popleft() for _ in range(10)] == list(range(1, 11))
+  pooled.extend(range(100, 110))
+  assert pooled.capacity == capacity
+  assert list(pooled) == list(range(11, 40)) + list(range(100, 110))
+  while len(pooled):
+    pooled.popleft()
+  with pytest.raises(IndexError):
+    pooled.popleft()
+  pooled.extend([7])
+  assert list(pooled) == [7] and pooled.head == pooled.tail
+
+@pytest.mark.parametrize("bad_value, error", [pytest.param('x', TypeError), pytest.param(2**63, OverflowError)])
+def test_pooled_linked_list_failed_extend_keeps_earlier_values(bad_value, error):
+  pooled = PooledLinkedList(capacity=4)
+  pooled.extend([1, 2])
+  with pytest.raises(error):
+    pooled.extend([3, 4, bad_value])
+  assert (len(pooled), list(pooled)) == (4, [1, 2, 3, 4])
+  pooled.extend([5, 6])
+  assert (len(pooled), list(pooled)) == (6, [1, 2, 3, 4, 5, 6])
+  assert pooled.capacity == 8
+
+@pytest.mark.parametrize("make_input", [list, iter, lambda values: _linked(LinkedList, values),
+                                        lambda values: _linked(PooledLinkedList, values)])
+def test_return_kth_to_end_data_many(make_input, capsys):
+  values = list(range(600))
+  ks = [0, 5, 50, 500, 599, 600]
+  assert return_kth_to_end_data_many(make_input(values), ks) == [599, 594, 549, 99, 0, None]
+  assert return_kth_to_end_data_many(make_input([]), [0]) == [None]
+  assert return_kth_to_end_data_many(make_input(values), []) == []
+  assert capsys.readouterr().out == ''
+  with pytest.raises(ValueError):
+    return_kth_to_end_data_many(make_input(values), [-1])
+
+def _linked(factory, values):
+  linked = factory()
+  linked.extend(values)
+  return linked
+
 if (__name__ == '__main__'):
   pytest.main(["--durations", "0"])
 
@@ -1,5 +1,8 @@
 import string
+import time
+from typing import Dict, Iterable, Optional, Sequence, Tuple, Union
 
+import numpy as np
 import pytest
 
 def unique_char_check(input: str) -> bool:
@@ -25,6 +28,8 @@ def unique_char_check(input: str) -> bool:
       Time complexity: O(n)
       Space complexity: O(n)
   """
+  if isinstance(input, (bytes, bytearray, memoryview)):
+    return unique_bytes_check(input)
   if not input:
     raise ValueError("Input was None or empty string")
 
@@ -42,6 +47,115 @@ def unique_char_check(input: str) -> bool:
 
   return True
 
+def unique_bytes_check(input: Union[bytes, bytearray, memoryview]) -> bool:
+  """Return true if a bytes-like input (e.g., ASCII text) has all unique byte values
+
+  Approach:
+      1) Pigeonhole: more than 256 bytes cannot all be unique
+      2) Otherwise compare the size of the set of byte values (built in C from the
+         buffer) to the input length
+      Time complexity: O(min(n, 256))
+  """
+  if input is None or len(input) == 0:
+    raise ValueError("Input was None or empty")
+  if isinstance(input, memoryview):
+    input = input.cast('B') if input.format != 'B' or input.ndim != 1 else input
+  if len(input) > 256:
+    return False
+  return len(set(input)) == len(input)
+
+def unique_char_check_batch(strings: Optional[Sequence[str]] = None,
+                            buffer: Optional[Union[bytes, bytearray, memoryview, np.ndarray]] = None,
+                            offsets: Optional[Sequence[int]] = None) -> np.ndarray:
+  """Run unique_char_check on many inputs at once
+
+  :param strings: Strings to check, or
+  :param buffer: All inputs back to back as bytes (or a uint8 array), with
+  :param offsets: N+1 increasing indexes into buffer. Input i is buffer[offsets[i]:offsets[i+1]]
+  :return: Boolean array with one entry per input (False for empty inputs)
+
+  Approach:
+      1) Byte input (and strings that are all ASCII) averaging at least 16 bytes -
+         For a chunk of inputs, count every (input, byte) pair with one np.bincount
+         into a (chunk, 256) table, the vectorized form of a 256-entry bitmap per
+         input. Any count above 1 is a duplicate. O(N) for N bytes in total
+      2) Shorter inputs, and other strings - Encode strings as UTF-32 so each character
+         is one code, and give every character a key (input index, code). Sort the
+         keys; a duplicate within one input shows up as two equal adjacent keys.
+         O(N log N), but cheaper than a 256 entry table per short input
+  """
+  if strings is not None:
+    lengths = np.fromiter((len(s) for s in strings), dtype=np.int64, count=len(strings))
+    joined = ''.join(strings)
+    if joined.isascii():
+      return _unique_bytes_batch(np.frombuffer(joined.encode('ascii'), dtype=np.uint8), lengths)
+    return _unique_codes_batch(np.frombuffer(joined.encode('utf-32-le'), dtype='<u4'), lengths)
+
+  if buffer is None or offsets is None:
+    raise ValueError("Provide either strings, or buffer and offsets.")
+  codes = buffer if isinstance(buffer, np.ndarray) else np.frombuffer(buffer, dtype=np.uint8)
+  offsets = np.asarray(offsets, dtype=np.int64)
+  if (codes.ndim != 1 or codes.dtype != np.uint8 or offsets.ndim != 1 or len(offsets) == 0 or
+      offsets[0] != 0 or offsets[-1] != len(codes) or (np.diff(offsets) < 0).any()):
+    raise ValueError("Offsets must increase from 0 to len(buffer) over a 1-D uint8 buffer.")
+  return _unique_bytes_batch(codes, np.diff(offsets))
+
+# Inputs per np.bincount call in _unique_bytes_batch (a table of 256 counts each)
+_BYTES_BATCH_CHUNK = 4096
+# Below this average input length, sorting keys beats filling the count tables
+_BYTES_TABLE_MIN_AVERAGE_LENGTH = 16
+
+def _unique_bytes_batch(codes: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+  if len(codes) < _BYTES_TABLE_MIN_AVERAGE_LENGTH * len(lengths):
+    return _unique_codes_batch(codes, lengths)
+  offsets = np.concatenate(([0], np.cumsum(lengths)))
+  unique = lengths > 0
+  for first in range(0, len(lengths), _BYTES_BATCH_CHUNK):
+    last = min(first + _BYTES_BATCH_CHUNK, len(lengths))
+    local_idxs = np.repeat(np.arange(last - first, dtype=np.int64), lengths[first:last])
+    counts = np.bincount((local_idxs << 8) | codes[offsets[first]:offsets[last]],
+                         minlength=(last - first) << 8)
+    unique[first:last] &= counts.reshape(-1, 256).max(axis=1) <= 1
+  return unique
+
+def _unique_codes_batch(codes: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+  number_inputs = len(lengths)
+  input_idxs = np.repeat(np.arange(number_inputs, dtype=np.int64), lengths)
+  # Unicode code points fit in 21 bits
+  keys = np.sort((input_idxs << 21) | codes.astype(np.int64))
+  duplicates = keys[1:] == keys[:-1]
+  has_duplicate = np.bincount(keys[1:][duplicates] >> 21, minlength=number_inputs) > 0
+  return (lengths > 0) & ~has_duplicate
+
+def benchmark_unique_char_check(string_lengths: Iterable[int] = (4, 16, 64),
+                                batch_sizes: Iterable[int] = (10**3, 10**5, 10**6),
+                                seed: int = 0) -> Dict[Tuple[int, int], Dict[str, float]]:
+  """Time unique_char_check in a loop against the batch APIs on random ASCII identifiers
+
+  :return: Seconds taken per (string length, batch size) and approach
+  """
+  rng = np.random.default_rng(seed)
+  alphabet = np.frombuffer((string.ascii_letters + string.digits + '_').encode('ascii'), dtype=np.uint8)
+  timings: Dict[Tuple[int, int], Dict[str, float]] = {}
+  for length in string_lengths:
+    for batch_size in batch_sizes:
+      buffer = alphabet[rng.integers(0, len(alphabet), size=length * batch_size)].tobytes()
+      offsets = np.arange(0, length * batch_size + 1, length)
+      strings = [buffer[start:start + length].decode('ascii') for start in range(0, len(buffer), length)]
+      timing = timings[(length, batch_size)] = {}
+
+      tic = time.perf_counter()
+      expected = [unique_char_check(s) for s in strings]
+      timing['loop'] = time.perf_counter() - tic
+      tic = time.perf_counter()
+      from_strings = unique_char_check_batch(strings)
+      timing['batch_strings'] = time.perf_counter() - tic
+      tic = time.perf_counter()
+      from_buffer = unique_char_check_batch(buffer=buffer, offsets=offsets)
+      timing['batch_buffer'] = time.perf_counter() - tic
+      assert from_strings.tolist() == expected == from_buffer.tolist()
+  return timings
+
 @pytest.mark.parametrize("test_input, expected_output",
   [pytest.param(None, None, marks=pytest.mark.xfail(reason='None passed as input')),
    pytest.param('', None, marks=pytest.mark.xfail(reason='Empty string passed as input')),
@@ -52,5 +166,29 @@ def unique_char_check(input: str) -> bool:
 def test_unique_char_check(test_input, expected_output):
   assert unique_char_check(test_input) == expected_output, 'Test case failed.'
 
+@pytest.mark.parametrize("test_input, expected_output",
+  [pytest.param(b'abcdefghiv', True),
+   pytest.param(bytearray(b'aa'), False),
+   pytest.param(memoryview(b'aAbBcC'), True),
+   pytest.param(bytes(range(256)), True),
+   pytest.param(bytes(range(256)) + b'a', False)])
+def test_unique_bytes_check(test_input, expected_output):
+  assert unique_bytes_check(test_input) == expected_output
+  assert unique_char_check(test_input) == expected_output
+
+def test_unique_char_check_batch():
+  strings = ['abcdefghiv', 'aa', 'aAbBcC', '.(*4)f6F', '', '\u00e9e\u00e9', '\u00e9e']
+  expected = [True, False, True, True, False, False, True]
+  assert unique_char_check_batch(strings).tolist() == expected
+  ascii_strings = strings[:5]
+  buffer = ''.join(ascii_strings).encode('ascii')
+  offsets = np.cumsum([0] + [len(s) for s in ascii_strings])
+  assert unique_char_check_batch(buffer=buffer, offsets=offsets).tolist() == expected[:5]
+  assert unique_char_check_batch([]).tolist() == []
+  long_strings = [string.ascii_letters, string.ascii_letters + 'a', string.printable[:90]]
+  assert unique_char_check_batch(long_strings).tolist() == [True, False, True]
+  with pytest.raises(ValueError):
+    unique_char_check_batch(buffer=buffer, offsets=[0, 3])
+
 if (__name__ == '__main__'):
   pytest.main(["--durations", "0"])
\ No newline at end of file
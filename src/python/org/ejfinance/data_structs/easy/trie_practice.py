@@ -1,37 +1,187 @@
-from typing import Iterable
+import mmap
+import random
+import string
+import struct
+import time
+from array import array
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
 
 import pytest
 
+from ..instrumentation import instrumented
+
 class _TrieNode:
+  """Trie node with children keyed by value in a dict (any alphabet)
+
+  The children dict is only allocated once the first child is added, since
+  most nodes in a trie are leaves.
+  """
+  __slots__ = ('value', 'is_word_end', 'children')
+
   def __init__(self, value, is_word_end: bool) -> None:
     self.value = value
     self.is_word_end: bool = is_word_end
-    self.children = []
+    self.children = None
+
+  def get_child(self, key):
+    return self.children.get(key) if self.children else None
+
+  def sorted_children(self) -> list:
+    return [self.children[key] for key in sorted(self.children)] if self.children else []
+
+  def add_child(self, key, child) -> None:
+    if self.children is None:
+      self.children = {}
+    self.children[key] = child
+
+class _DenseTrieNode:
+  """Trie node with children stored in a fixed-size list, one slot per alphabet symbol"""
+  __slots__ = ('value', 'is_word_end', 'children')
+
+  def __init__(self, value, is_word_end: bool, alphabet_size: int) -> None:
+    self.value = value
+    self.is_word_end: bool = is_word_end
+    self.children = [None] * alphabet_size
+
+  def get_child(self, key):
+    return self.children[key]
 
-  def add_child(self, child) -> None:
-    self.children.append(child)
+  def sorted_children(self) -> list:
+    return [child for child in self.children if child is not None]
 
-  def __eq__(self, other):
-    if isinstance(other, _TrieNode):
-      return self.value == other.value
-    elif isinstance(other, type(self.value)):
-      return self.value == other
-    return False
+  def add_child(self, key, child) -> None:
+    self.children[key] = child
 
 class Trie:
-  def __init__(self) -> None:
-    self.root = _TrieNode(None, False)
+  """Prefix tree of sequences (e.g., strings)
+
+  Conditions:
+    1) Lookup and insert are O(key length), independent of node fan-out
+    2) Alphabet may be unbounded (dict children), or a small fixed set of
+       symbols known beforehand (dense list children)
+
+  Approach:
+    - Sparse mode (default) - Each node maps child value -> child node in a dict
+    - Dense mode (alphabet provided) - Each node holds a list with one slot per
+      alphabet symbol, in sorted order. Symbols are translated to slot indexes
+      through a single dict owned by the Trie. Faster per step, but every node
+      pays for the full alphabet, so only use it for small alphabets (e.g., DNA,
+      digits, a-z)
+    - Both node types use __slots__ to avoid a per-node __dict__
+    - insert_many - Sort the keys, so each key shares its longest common prefix
+      with the previous one. Keep the node path of the previous key and resume
+      from the end of the shared prefix instead of walking from the root
+    - iter_prefix - Walk to the prefix node, then run a depth first traversal
+      with an explicit stack, visiting children in sorted order. Yielding a word
+      before its extensions gives lexicographic order lazily, so the first N
+      completions cost O(N * key length) regardless of trie size
+    - lookup_many - Same idea as insert_many for queries. Visit the queries in
+      sorted order and keep the node path matched for the previous query, so a
+      shared prefix is walked once and repeated queries are answered from the
+      previous one. Misses are recorded silently (no I/O)
+    - freeze - Convert a trie of string keys to a read-only FrozenTrie
+    - Instrumentation - instrument(trie) counts nodes visited and misses for
+      lookup, nodes visited for insert, nodes allocated by insert/insert_many,
+      and times (without counting visits) lookup_many/insert_many, for that trie only
+  """
+  _INSTRUMENTED = {'lookup': '_counted_lookup', 'insert': '_counted_insert', '_new_node': '_counted_new_node'}
+  _TIMED = {'lookup_many': 'trie.lookup_many', 'insert_many': 'trie.insert_many'}
+
+  def __init__(self, alphabet: Optional[Iterable] = None) -> None:
+    if alphabet is None:
+      self._alphabet_index = None
+      self.root = _TrieNode(None, False)
+    else:
+      self._alphabet_index = {val: idx for idx, val in enumerate(sorted(set(alphabet)))}
+      self.root = self._new_node(None, False)
+
+  def _new_node(self, value, is_word_end: bool):
+    if self._alphabet_index is None:
+      return _TrieNode(value, is_word_end)
+    return _DenseTrieNode(value, is_word_end, len(self._alphabet_index))
+
+  def _key(self, val):
+    if self._alphabet_index is None:
+      return val
+    try:
+      return self._alphabet_index[val]
+    except KeyError:
+      raise ValueError(f"Value {val!r} is not in the trie alphabet.") from None
 
   def lookup(self, iter: Iterable):
     cur_node = self.root
     found: bool = False
     try:
-      for idx, val in enumerate(iter):
-        child_idx = cur_node.children.index(val)
-        cur_node = cur_node.children[child_idx]
+      for val in iter:
+        cur_node = cur_node.get_child(self._key(val))
+        if cur_node is None:
+          raise ValueError()
       found = True if cur_node.is_word_end else False
     except ValueError:
-      print("Pattern not found.")
+      # Pattern not found
+      found = False
+
+    return found
+
+  def _counted_lookup(self, iter: Iterable):
+    stats = self._stats
+    stats.add('trie.lookups')
+    cur_node = self.root
+    visited = 0
+    try:
+      for val in iter:
+        cur_node = cur_node.get_child(self._key(val))
+        if cur_node is None:
+          break
+        visited += 1
+    except ValueError:
+      cur_node = None
+    stats.add('trie.nodes_visited', visited)
+    found = cur_node is not None and cur_node.is_word_end
+    if not found:
+      stats.add('trie.misses')
+    return found
+
+  def lookup_many(self, keys: Sequence[Sequence]) -> List[bool]:
+    """Look up many keys at once
+
+    :param keys: Keys to look up
+    :return: found flags, in the same order as keys
+    """
+    found: List[bool] = [False] * len(keys)
+    alphabet_index = self._alphabet_index
+    prev_key: Sequence = ()
+    # path[d] is the node reached after the first d values of prev_key. It is
+    # shorter than prev_key + 1 when prev_key left the trie early
+    path: list = [self.root]
+    for key_idx in sorted(range(len(keys)), key=keys.__getitem__):
+      key = keys[key_idx]
+      # Repeated queries are adjacent once sorted
+      if key == prev_key and len(path) > len(key):
+        found[key_idx] = path[-1].is_word_end
+        continue
+      common = 0
+      max_common = min(len(key), len(path) - 1)
+      while common < max_common and key[common] == prev_key[common]:
+        common += 1
+      del path[common+1:]
+
+      node = path[-1]
+      for idx in range(common, len(key)):
+        # Child access is inlined for both node types; this is the hot loop
+        children = node.children
+        if alphabet_index is None:
+          node = children.get(key[idx]) if children else None
+        else:
+          slot = alphabet_index.get(key[idx])
+          node = None if slot is None else children[slot]
+        if node is None:
+          break
+        path.append(node)
+      else:
+        found[key_idx] = node.is_word_end
+      prev_key = key
 
     return found
 
@@ -39,15 +189,322 @@ class Trie:
     parent_node = self.root
     for idx, val in enumerate(iter):
       is_word_end = False if (idx < len(iter) - 1) else True
-      if val in parent_node.children:
-        child_idx = parent_node.children.index(val)
-        node: _TrieNode = parent_node.children[child_idx]
-        node.is_word_end = True if (idx == len(iter) - 1) else node.is_word_end
+      key = self._key(val)
+      node = parent_node.get_child(key)
+      if node is not None:
+        node.is_word_end = True if is_word_end else node.is_word_end
       else:
-        node = _TrieNode(val, is_word_end)
-        parent_node.add_child(node)
+        node = self._new_node(val, is_word_end)
+        parent_node.add_child(key, node)
       parent_node = node
 
+  def _counted_insert(self, iter: Iterable):
+    # insert walks (or creates) one node per value. New nodes are counted by _counted_new_node
+    self._stats.add('trie.nodes_visited', len(iter))
+    Trie.insert(self, iter)
+
+  def _counted_new_node(self, value, is_word_end: bool):
+    self._stats.add('trie.nodes_allocated')
+    return Trie._new_node(self, value, is_word_end)
+
+  def insert_many(self, keys: Iterable[Sequence]):
+    prev_key: Sequence = ()
+    path: list = [self.root]
+    for key in sorted(keys):
+      # Length of the prefix shared with the previously inserted key
+      common = 0
+      max_common = min(len(key), len(prev_key))
+      while common < max_common and key[common] == prev_key[common]:
+        common += 1
+      del path[common+1:]
+
+      parent_node = path[-1]
+      for idx in range(common, len(key)):
+        val = key[idx]
+        child_key = self._key(val)
+        node = parent_node.get_child(child_key)
+        if node is None:
+          node = self._new_node(val, False)
+          parent_node.add_child(child_key, node)
+        path.append(node)
+        parent_node = node
+      if key:
+        parent_node.is_word_end = True
+      prev_key = key
+
+  def iter_prefix(self, prefix: Sequence = '', limit: Optional[int] = None) -> Iterator:
+    """Lazily yield the keys starting with prefix in lexicographic order
+
+    :param prefix: Key prefix to complete. Its type (str or other sequence) sets the
+      type of the yielded keys (str or tuple)
+    :param limit: Maximum number of keys to yield (None means all)
+    """
+    matches = self._iter_prefix(prefix)
+    return matches if limit is None else islice(matches, limit)
+
+  def _iter_prefix(self, prefix: Sequence) -> Iterator:
+    node = self.root
+    for val in prefix:
+      if self._alphabet_index is not None and val not in self._alphabet_index:
+        return
+      node = node.get_child(self._key(val))
+      if node is None:
+        return
+
+    build = ''.join if isinstance(prefix, str) else tuple
+    values = list(prefix)
+    if prefix and node.is_word_end:
+      yield build(values)
+
+    # Stack of child iterators, one per level below the prefix node
+    stack = [iter(node.sorted_children())]
+    while stack:
+      child = next(stack[-1], None)
+      if child is None:
+        stack.pop()
+        if values:
+          values.pop()
+        continue
+      values.append(child.value)
+      if child.is_word_end:
+        yield build(values)
+      stack.append(iter(child.sorted_children()))
+
+  def freeze(self) -> 'FrozenTrie':
+    """Return a read-only, path compressed copy of this trie (string keys only)
+
+    :raises TypeError: If a key is not a str. iter_prefix('') joins node values into
+      strings, so e.g. ('new', 'york') would otherwise freeze as 'newyork'
+    """
+    stack = self.root.sorted_children()
+    while stack:
+      node = stack.pop()
+      if not (isinstance(node.value, str) and len(node.value) == 1):
+        raise TypeError(f"Only tries of str keys can be frozen, found key element {node.value!r}.")
+      stack.extend(node.sorted_children())
+    return FrozenTrie.from_keys(self.iter_prefix(''))
+
+def benchmark_lookup_many(number_keys: int = 200000, number_queries: int = 200000,
+                          key_length: int = 12, seed: int = 0) -> Dict[str, float]:
+  """Time Trie.lookup_many against calling Trie.lookup in a loop
+
+  Half of the queries are inserted keys and half are random misses.
+
+  :return: Seconds taken by each approach
+  """
+  rng = random.Random(seed)
+  def random_key():
+    return ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(key_length // 2, key_length)))
+  keys = [random_key() for _ in range(number_keys)]
+  queries = [keys[rng.randrange(number_keys)] if (i % 2 == 0) else random_key()
+             for i in range(number_queries)]
+  t1 = Trie()
+  t1.insert_many(keys)
+
+  timings: Dict[str, float] = {}
+  tic = time.perf_counter()
+  expected = [t1.lookup(query) for query in queries]
+  timings['lookup_loop'] = time.perf_counter() - tic
+  tic = time.perf_counter()
+  found = t1.lookup_many(queries)
+  timings['lookup_many'] = time.perf_counter() - tic
+  assert found == expected
+  return timings
+
+_FROZEN_MAGIC = 0x49525446  # b'FTRI' read as a little endian u32
+_FROZEN_VERSION = 1
+_FROZEN_HEADER = struct.Struct('=5I')  # magic, version, node count, edge count, label bytes
+
+class FrozenTrie:
+  """Read-only radix tree of string keys stored in flat arrays
+
+  Conditions:
+    1) Built once from a Trie (Trie.freeze) or from string keys, then never modified
+    2) Can be saved to a binary file and reopened with mmap, so many processes
+       share one copy of the pages and nothing is parsed at startup
+    3) Supports lookup and iter_prefix directly on the (mapped) buffer
+
+  Approach:
+    - Keys are UTF-8 encoded. Byte order matches code point order, so sorted
+      keys stay sorted
+    - Path compression - Chains of nodes with one child and no word end are
+      merged into a single edge labelled with a byte string
+    - Nodes and edges are stored as CSR style u32 arrays:
+        node_edge_starts[node_count+1] - Edges of node n are [starts[n], starts[n+1]),
+                                         sorted by the first byte of their label
+        edge_label_starts[edge_count+1] - Label of edge e is labels[starts[e]:starts[e+1]]
+        edge_targets[edge_count]       - Child node of edge e
+        word_ends[node_count]          - 1 if the node ends a key (u8)
+        labels                         - Concatenated edge labels (bytes)
+    - File layout is a fixed header followed by the arrays above in that order,
+      in native byte order. The arrays are memoryview casts over the buffer, so
+      opening a file only maps it
+  """
+  def __init__(self, buffer) -> None:
+    self._buffer = buffer
+    view = memoryview(buffer)
+    (magic, version, node_count, edge_count, label_bytes) = _FROZEN_HEADER.unpack_from(view, 0)
+    if magic != _FROZEN_MAGIC or version != _FROZEN_VERSION:
+      raise ValueError("Buffer does not hold a FrozenTrie (bad magic or version).")
+
+    offset = _FROZEN_HEADER.size
+    sections = []
+    for count in (node_count + 1, edge_count + 1, edge_count):
+      sections.append(view[offset:offset + 4 * count].cast('I'))
+      offset += 4 * count
+    (self._node_edge_starts, self._edge_label_starts, self._edge_targets) = sections
+    self._word_ends = view[offset:offset + node_count]
+    offset += node_count
+    self._labels = view[offset:offset + label_bytes]
+    self._views = [view] + sections + [self._word_ends, self._labels]
+    self.node_count: int = node_count
+    self.edge_count: int = edge_count
+
+  @classmethod
+  def from_keys(cls, keys: Iterable[str]) -> 'FrozenTrie':
+    return cls(cls._build(sorted(set(key.encode('utf-8') for key in keys))))
+
+  @classmethod
+  def load(cls, path) -> 'FrozenTrie':
+    with open(path, 'rb') as f:
+      buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return cls(buffer)
+
+  def save(self, path) -> None:
+    with open(path, 'wb') as f:
+      f.write(self._buffer)
+
+  def close(self) -> None:
+    # Exported memoryviews must be released before a mmap can be closed
+    for view in reversed(self._views):
+      view.release()
+    self._views = []
+    if isinstance(self._buffer, mmap.mmap):
+      self._buffer.close()
+
+  def __enter__(self) -> 'FrozenTrie':
+    return self
+
+  def __exit__(self, *exc_info) -> None:
+    self.close()
+
+  @staticmethod
+  def _build(keys: list) -> bytes:
+    node_edge_starts = array('I')
+    edge_label_starts = array('I', [0])
+    edge_targets = array('I')
+    word_ends = bytearray()
+    labels = bytearray()
+
+    # Breadth first, so node ids are handed out (and their edges laid out) in
+    # processing order. Each item is (sorted key range [lo, hi), depth in bytes)
+    queue = [(0, len(keys), 0)]
+    node_count = 1
+    for (lo, hi, depth) in queue:
+      node_edge_starts.append(len(edge_targets))
+      is_word_end = lo < hi and len(keys[lo]) == depth
+      word_ends.append(1 if is_word_end else 0)
+      if is_word_end:
+        lo += 1
+
+      while lo < hi:
+        # Group keys sharing the next byte; the edge label is their common prefix
+        first_byte = keys[lo][depth]
+        group_end = lo + 1
+        while group_end < hi and keys[group_end][depth] == first_byte:
+          group_end += 1
+        first, last = keys[lo], keys[group_end - 1]
+        label_end = depth + 1
+        while (label_end < len(first) and label_end < len(last) and
+               first[label_end] == last[label_end]):
+          label_end += 1
+
+        labels += first[depth:label_end]
+        edge_label_starts.append(len(labels))
+        edge_targets.append(node_count)
+        queue.append((lo, group_end, label_end))
+        node_count += 1
+        lo = group_end
+    node_edge_starts.append(len(edge_targets))
+
+    header = _FROZEN_HEADER.pack(_FROZEN_MAGIC, _FROZEN_VERSION, node_count,
+                                 len(edge_targets), len(labels))
+    return b''.join([header, node_edge_starts.tobytes(), edge_label_starts.tobytes(),
+                     edge_targets.tobytes(), bytes(word_ends), bytes(labels)])
+
+  def _find_edge(self, node: int, byte: int) -> int:
+    # Binary search the node's edges on the first byte of their label
+    lo, hi = self._node_edge_starts[node], self._node_edge_starts[node + 1]
+    while lo < hi:
+      mid = (lo + hi) // 2
+      mid_byte = self._labels[self._edge_label_starts[mid]]
+      if mid_byte == byte:
+        return mid
+      if mid_byte < byte:
+        lo = mid + 1
+      else:
+        hi = mid
+    return -1
+
+  def _walk(self, key: bytes):
+    """Follow key from the root
+
+    :return: (node, remainder) where node is the node at or below the end of the key
+             and remainder is the unmatched tail of the last edge, or (-1, b'') if the
+             key leaves the trie
+    """
+    node, pos = 0, 0
+    while pos < len(key):
+      edge = self._find_edge(node, key[pos])
+      if edge < 0:
+        return (-1, b'')
+      label = self._labels[self._edge_label_starts[edge]:self._edge_label_starts[edge + 1]]
+      matched = min(len(label), len(key) - pos)
+      if label[:matched] != key[pos:pos + matched]:
+        return (-1, b'')
+      node = self._edge_targets[edge]
+      pos += matched
+      if matched < len(label):
+        return (node, bytes(label[matched:]))
+    return (node, b'')
+
+  def lookup(self, key: str) -> bool:
+    (node, remainder) = self._walk(key.encode('utf-8'))
+    return node >= 0 and not remainder and self._word_ends[node] == 1
+
+  def __contains__(self, key: str) -> bool:
+    return self.lookup(key)
+
+  def iter_prefix(self, prefix: str = '', limit: Optional[int] = None) -> Iterator[str]:
+    """Lazily yield the keys starting with prefix in lexicographic order"""
+    matches = self._iter_prefix(prefix)
+    return matches if limit is None else islice(matches, limit)
+
+  def _iter_prefix(self, prefix: str) -> Iterator[str]:
+    encoded = prefix.encode('utf-8')
+    (node, remainder) = self._walk(encoded)
+    if node < 0:
+      return
+
+    # Stack of (node, next edge, end edge, length of path before the node's edges)
+    path = bytearray(encoded + remainder)
+    if self._word_ends[node]:
+      yield path.decode('utf-8')
+    stack = [[self._node_edge_starts[node], self._node_edge_starts[node + 1], len(path)]]
+    while stack:
+      frame = stack[-1]
+      if frame[0] == frame[1]:
+        stack.pop()
+        continue
+      edge = frame[0]
+      frame[0] += 1
+      del path[frame[2]:]
+      path += self._labels[self._edge_label_starts[edge]:self._edge_label_starts[edge + 1]]
+      child = self._edge_targets[edge]
+      if self._word_ends[child]:
+        yield path.decode('utf-8')
+      stack.append([self._node_edge_starts[child], self._node_edge_starts[child + 1], len(path)])
+
 @pytest.mark.parametrize("test_insert, test_lookup, expected_output",
   [pytest.param('hello world', 'hello world', True),
    pytest.param('hello world', 'hello world!', False),
@@ -57,6 +514,112 @@ def test_insert_and_lookup(test_insert, test_lookup, expected_output):
   t1.insert(test_insert)
   assert t1.lookup(test_lookup) == expected_output
 
+@pytest.mark.parametrize("alphabet", [None, 'abcdefghijklmnopqrstuvwxyz'])
+def test_prefixes_and_wide_nodes(alphabet):
+  t1 = Trie(alphabet)
+  words = ['car', 'cart', 'ca', 'dog'] + [f'z{c}' for c in 'abcdefghijklmnopqrstuvwxy']
+  for word in words:
+    t1.insert(word)
+  for word in words:
+    assert t1.lookup(word)
+  assert not t1.lookup('c')
+  assert not t1.lookup('carts')
+  assert not t1.lookup('do')
+
+def test_dense_trie_rejects_symbols_outside_alphabet():
+  t1 = Trie('acgt')
+  t1.insert('gattaca')
+  assert t1.lookup('gattaca')
+  assert not t1.lookup('gattaxa')
+  with pytest.raises(ValueError):
+    t1.insert('gattaxa')
+
+@pytest.mark.parametrize("alphabet", [None, 'abcdefghijklmnopqrstuvwxyz'])
+def test_insert_many_and_iter_prefix(alphabet):
+  words = ['tea', 'ten', 'to', 'inn', 'in', 'tear', 'a', 'team', 'tea']
+  t1 = Trie(alphabet)
+  t1.insert_many(words)
+  for word in words:
+    assert t1.lookup(word)
+  assert not t1.lookup('te')
+  assert list(t1.iter_prefix()) == sorted(set(words))
+  assert list(t1.iter_prefix('te')) == ['tea', 'team', 'tear', 'ten']
+  assert list(t1.iter_prefix('tea', limit=2)) == ['tea', 'team']
+  assert list(t1.iter_prefix('x')) == []
+  assert list(t1.iter_prefix('in')) == ['in', 'inn']
+
+def test_iter_prefix_on_token_sequences():
+  t1 = Trie()
+  t1.insert_many([('new', 'york'), ('new', 'jersey'), ('boston',)])
+  assert list(t1.iter_prefix(('new',))) == [('new', 'jersey'), ('new', 'york')]
+
+@pytest.mark.parametrize("alphabet", [None, 'abcdefghijklmnopqrstuvwxyz'])
+def test_lookup_many(alphabet, capsys):
+  t1 = Trie(alphabet)
+  t1.insert_many(['tea', 'ten', 'to', 'inn', 'in', 'tear'])
+  queries = ['tea', 'te', 'tear', 'zebra', 'in', 'tea', 'i', 'team', 'to!', '', 'inn']
+  assert t1.lookup_many(queries) == [t1.lookup(query) for query in queries]
+  assert t1.lookup_many(queries) == [True, False, True, False, True, True, False, False, False, False, True]
+  capsys.readouterr()
+  t1.lookup_many(queries)
+  assert capsys.readouterr().out == ''
+
+@pytest.mark.parametrize("alphabet", [None, 'abcdefghijklmnopqrstuvwxyz'])
+def test_trie_instrumentation(alphabet, capsys):
+  t1 = Trie(alphabet)
+  with instrumented(t1) as stats:
+    t1.insert('tea')
+    t1.insert('ten')
+    t1.insert_many(['to', 'tear'])
+    assert [t1.lookup(key) for key in ['tea', 'te', 'zebra', 'to!']] == [True, False, False, False]
+  assert stats.counters == {'trie.nodes_visited': 6 + 3 + 2 + 0 + 2, 'trie.nodes_allocated': 6,
+                            'trie.lookups': 4, 'trie.misses': 3}
+  assert stats.timers['trie.insert_many']['calls'] == 1
+  assert capsys.readouterr().out == ''
+  t1.lookup('zebra')
+  assert stats.counters['trie.misses'] == 3
+
+FROZEN_WORDS = ['tea', 'ten', 'to', 'inn', 'in', 'tear', 'a', 'team', 'toast', 'caf\u00e9', 'cafe']
+
+@pytest.mark.parametrize("alphabet", [None, 'abcdefghijklmnopqrstuvwxyz\u00e9'])
+def test_freeze_lookup_and_iter_prefix(alphabet):
+  t1 = Trie(alphabet)
+  t1.insert_many(FROZEN_WORDS)
+  frozen = t1.freeze()
+  for word in FROZEN_WORDS:
+    assert frozen.lookup(word)
+  for missing in ['', 't', 'te', 'tearing', 'xyz', 'caf', 'toa']:
+    assert not frozen.lookup(missing)
+  assert list(frozen.iter_prefix()) == list(t1.iter_prefix())
+  for prefix in ['t', 'te', 'tea', 'to', 'toa', 'caf', 'x', '']:
+    assert list(frozen.iter_prefix(prefix)) == list(t1.iter_prefix(prefix))
+  assert list(frozen.iter_prefix('t', limit=2)) == ['tea', 'team']
+
+@pytest.mark.parametrize("keys", [[('new', 'york'), ('boston',)], [[1, 2], [1, 3]], ['ok', ('o', 'kay')]])
+def test_freeze_rejects_non_string_keys(keys):
+  t1 = Trie()
+  for key in keys:
+    t1.insert(key)
+  with pytest.raises(TypeError):
+    t1.freeze()
+
+def test_frozen_trie_is_path_compressed():
+  frozen = FrozenTrie.from_keys(['interview', 'internet'])
+  # Root -> 'inter' -> {'view', 'net'}
+  assert frozen.node_count == 4
+  assert frozen.edge_count == 3
+
+def test_frozen_trie_save_and_mmap_load(tmp_path):
+  path = tmp_path / 'words.ftrie'
+  FrozenTrie.from_keys(FROZEN_WORDS).save(path)
+  with FrozenTrie.load(path) as frozen:
+    assert frozen.lookup('toast')
+    assert not frozen.lookup('toas')
+    assert list(frozen.iter_prefix('te')) == ['tea', 'team', 'tear', 'ten']
+
+def test_frozen_trie_rejects_foreign_buffer():
+  with pytest.raises(ValueError):
+    FrozenTrie(bytes(64))
+
 if (__name__ == '__main__'):
   pytest.main()
-  
\ No newline at end of file
@@ -0,0 +1,234 @@
+import contextlib
+import contextvars
+import copy
+import functools
+import json
+import time
+import types
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import pytest
+
+"""
+Opt-in counters and timers for the data structures and algorithms in data_structs
+
+Classes list the methods that have a counted variant in _INSTRUMENTED (method name ->
+counted method name), and the methods to time in _TIMED (method name -> timer name).
+instrument(obj) binds those variants on the one instance, so the class and every other
+instance keep running the plain methods, and nothing is checked while disabled.
+
+Functions (e.g., the array algorithms) read the Stats made active by instrumented()
+once per call, and only count when one is active.
+
+Usage:
+  with instrumented(heap, trie) as stats:
+    heap.push_many(values)
+    trie.lookup('tea')
+    estimate_water_trapped(heights)
+  stats.snapshot() -> {'counters': {'min_heap.comparisons': ...}, 'maxima': {...}, 'timers': {...}}
+"""
+
+class Stats:
+  """Counters, maxima and timers, keyed by '<structure>.<name>'"""
+  def __init__(self):
+    self.counters: Dict[str, int] = {}
+    self.maxima: Dict[str, float] = {}
+    self.timers: Dict[str, Dict[str, float]] = {}
+
+  def add(self, name: str, amount: int = 1):
+    self.counters[name] = self.counters.get(name, 0) + amount
+
+  def record_max(self, name: str, value: float):
+    if name not in self.maxima or value > self.maxima[name]:
+      self.maxima[name] = value
+
+  @contextlib.contextmanager
+  def timer(self, name: str) -> Iterator[None]:
+    tic = time.perf_counter()
+    try:
+      yield
+    finally:
+      timer = self.timers.setdefault(name, {'calls': 0, 'total_s': 0.0})
+      timer['calls'] += 1
+      timer['total_s'] += time.perf_counter() - tic
+
+  def snapshot(self) -> Dict[str, Any]:
+    """Copy of everything recorded so far"""
+    return {'counters': dict(self.counters), 'maxima': dict(self.maxima), 'timers': copy.deepcopy(self.timers)}
+
+  def to_json(self, **kwargs) -> str:
+    return json.dumps(self.snapshot(), **kwargs)
+
+  def reset(self):
+    self.counters.clear()
+    self.maxima.clear()
+    self.timers.clear()
+
+_ACTIVE_STATS: contextvars.ContextVar = contextvars.ContextVar('data_structs_stats', default=None)
+
+def active_stats() -> Optional[Stats]:
+  """Stats collecting function calls in the current context, or None"""
+  return _ACTIVE_STATS.get()
+
+def timed_function(name: str) -> Callable:
+  """Decorator recording calls of a function under a timer while stats are active"""
+  def decorate(func: Callable) -> Callable:
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+      stats = _ACTIVE_STATS.get()
+      if stats is None:
+        return func(*args, **kwargs)
+      with stats.timer(name):
+        return func(*args, **kwargs)
+    return wrapper
+  return decorate
+
+def _timed_method(method: Callable, stats: Stats, name: str) -> Callable:
+  @functools.wraps(method)
+  def timed(*args, **kwargs):
+    with stats.timer(name):
+      return method(*args, **kwargs)
+  return timed
+
+def instrument(obj, stats: Optional[Stats] = None) -> Stats:
+  """Start counting operations on one instance
+
+  :param stats: Stats to record into, shared with other instances if given
+  :return: The Stats recording for obj
+  """
+  cls = type(obj)
+  if not hasattr(cls, '_INSTRUMENTED') and not hasattr(cls, '_TIMED'):
+    raise TypeError(f"{cls.__name__} does not support instrumentation.")
+  uninstrument(obj)
+  stats = stats if stats is not None else Stats()
+  obj._stats = stats
+  for (name, counted_name) in getattr(cls, '_INSTRUMENTED', {}).items():
+    setattr(obj, name, types.MethodType(getattr(cls, counted_name), obj))
+  for (name, timer_name) in getattr(cls, '_TIMED', {}).items():
+    setattr(obj, name, _timed_method(getattr(obj, name), stats, timer_name))
+  return stats
+
+def _instance_overrides(obj) -> Dict[str, Any]:
+  # Attributes set on the instance by instrument(), if any
+  cls = type(obj)
+  names = (*getattr(cls, '_INSTRUMENTED', {}), *getattr(cls, '_TIMED', {}), '_stats')
+  return {name: obj.__dict__[name] for name in names if name in obj.__dict__}
+
+def uninstrument(obj):
+  """Restore the plain methods on an instance"""
+  for name in _instance_overrides(obj):
+    del obj.__dict__[name]
+
+@contextlib.contextmanager
+def instrumented(*objs, stats: Optional[Stats] = None) -> Iterator[Stats]:
+  """Count operations on objs, and on instrumented functions, within the block
+
+  On exit, each object gets back the instrumentation it had before the block (none,
+  instrument(obj), or an enclosing instrumented() block).
+  """
+  stats = stats if stats is not None else Stats()
+  previous = [(obj, _instance_overrides(obj)) for obj in objs]
+  token = _ACTIVE_STATS.set(stats)
+  try:
+    for obj in objs:
+      instrument(obj, stats)
+    yield stats
+  finally:
+    for (obj, overrides) in previous:
+      uninstrument(obj)
+      obj.__dict__.update(overrides)
+    _ACTIVE_STATS.reset(token)
+
+class _Counter:
+  _INSTRUMENTED = {'step': '_counted_step'}
+  _TIMED = {'run': 'counter.run'}
+
+  def __init__(self):
+    self.value = 0
+
+  def step(self):
+    self.value += 1
+
+  def _counted_step(self):
+    self._stats.add('counter.steps')
+    _Counter.step(self)
+
+  def run(self, times: int):
+    for _ in range(times):
+      self.step()
+
+@timed_function('double')
+def _double(value):
+  stats = active_stats()
+  if stats is not None:
+    stats.add('double.calls')
+  return 2 * value
+
+def test_instrument_single_instance():
+  (counted, plain) = (_Counter(), _Counter())
+  stats = instrument(counted)
+  counted.run(3)
+  plain.run(3)
+  assert (counted.value, plain.value) == (3, 3)
+  assert stats.counters == {'counter.steps': 3}
+  assert stats.timers['counter.run']['calls'] == 1
+  uninstrument(counted)
+  counted.run(1)
+  assert stats.counters == {'counter.steps': 3}
+  assert 'step' not in counted.__dict__
+  with pytest.raises(TypeError):
+    instrument(object())
+
+def test_instrumented_context():
+  counter = _Counter()
+  assert _double(2) == 4 and active_stats() is None
+  with instrumented(counter) as stats:
+    counter.run(2)
+    assert _double(3) == 6
+    with instrumented() as inner:
+      _double(1)
+    _double(1)
+  assert active_stats() is None
+  _double(1)
+  counter.run(5)
+  assert stats.counters == {'counter.steps': 2, 'double.calls': 2}
+  assert stats.timers['double']['calls'] == 2
+  assert inner.counters == {'double.calls': 1}
+
+def test_instrumented_restores_previous_state():
+  counter = _Counter()
+  with instrumented(counter) as outer:
+    counter.step()
+    with instrumented(counter) as inner:
+      counter.step()
+    counter.step()
+  counter.step()
+  assert (outer.counters, inner.counters) == ({'counter.steps': 2}, {'counter.steps': 1})
+  assert '_stats' not in counter.__dict__
+
+  own = instrument(counter)
+  with instrumented(counter) as block:
+    counter.run(1)
+  counter.run(2)
+  assert (own.counters, block.counters) == ({'counter.steps': 2}, {'counter.steps': 1})
+  assert own.timers['counter.run']['calls'] == 1
+  assert counter._stats is own
+
+def test_snapshot_is_json():
+  stats = Stats()
+  stats.add('a.count', 2)
+  stats.record_max('a.depth', 3)
+  stats.record_max('a.depth', 1)
+  with stats.timer('a.op'):
+    pass
+  snapshot = json.loads(stats.to_json())
+  assert snapshot['counters'] == {'a.count': 2}
+  assert snapshot['maxima'] == {'a.depth': 3}
+  assert snapshot['timers']['a.op']['calls'] == 1
+  stats.snapshot()['counters']['a.count'] = 0
+  assert stats.counters['a.count'] == 2
+  stats.reset()
+  assert stats.snapshot() == {'counters': {}, 'maxima': {}, 'timers': {}}
+
+if (__name__ == '__main__'):
+  pytest.main(["--durations", "0"])
@@ -0,0 +1,366 @@
+import asyncio
+import itertools
+import queue
+import random
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+import pytest
+
+from ..easy.build_min_heap import MinHeap
+
+"""
+Problem statement: Share one MinHeap between producer and consumer threads, or between asyncio tasks
+
+Assumptions:
+  1) Items are anything MinHeap can order (e.g., (priority, sequence, payload) tuples)
+  2) Capacity is optionally bounded (maxsize <= 0 means unbounded). Producers wait
+     when the queue is full (backpressure) and consumers wait when it is empty
+
+Examples:
+  1) q = ThreadSafeMinHeap(maxsize=2); q.put(5); q.put(1); q.get() -> 1
+  2) q.put(3); q.put(4, timeout=0.1) -> raises queue.Full after 0.1 seconds
+
+Approach:
+  1) ThreadSafeMinHeap - One lock guarding the heap, with two conditions on it
+     (not_empty, not_full), mirroring queue.Queue. Raises queue.Empty/queue.Full
+     on timeout or for the *_nowait variants
+  2) AsyncMinHeap - Same protocol for a single event loop, with not_empty/not_full
+     asyncio.Conditions over one asyncio.Lock. Each put or get wakes a single waiter.
+     Raises asyncio.QueueEmpty/asyncio.QueueFull for the *_nowait variants
+
+Runtime:
+  put runtime complexity: O(log n) plus any wait
+  get runtime complexity: O(log n) plus any wait
+"""
+class ThreadSafeMinHeap:
+  def __init__(self, init_values: Iterable = (), maxsize: int = 0):
+    self.maxsize = maxsize
+    self._heap = MinHeap(init_values)
+    self._lock = threading.Lock()
+    self._not_empty = threading.Condition(self._lock)
+    self._not_full = threading.Condition(self._lock)
+
+  def qsize(self) -> int:
+    with self._lock:
+      return len(self._heap)
+
+  def _is_full(self) -> bool:
+    return 0 < self.maxsize <= len(self._heap)
+
+  def put(self, item, block: bool = True, timeout: Optional[float] = None):
+    with self._not_full:
+      if not block:
+        if self._is_full():
+          raise queue.Full
+      elif timeout is None:
+        while self._is_full():
+          self._not_full.wait()
+      else:
+        if timeout < 0:
+          raise ValueError("'timeout' must be a non-negative number")
+        if not self._not_full.wait_for(lambda: not self._is_full(), timeout):
+          raise queue.Full
+      self._heap.insert(item)
+      self._not_empty.notify()
+
+  def get(self, block: bool = True, timeout: Optional[float] = None):
+    with self._not_empty:
+      if not block:
+        if len(self._heap) == 0:
+          raise queue.Empty
+      elif timeout is None:
+        while len(self._heap) == 0:
+          self._not_empty.wait()
+      else:
+        if timeout < 0:
+          raise ValueError("'timeout' must be a non-negative number")
+        if not self._not_empty.wait_for(lambda: len(self._heap) > 0, timeout):
+          raise queue.Empty
+      item = self._heap.extract_min()
+      self._not_full.notify()
+      return item
+
+  def put_nowait(self, item):
+    return self.put(item, block=False)
+
+  def get_nowait(self):
+    return self.get(block=False)
+
+class AsyncMinHeap:
+  def __init__(self, init_values: Iterable = (), maxsize: int = 0):
+    self.maxsize = maxsize
+    self._heap = MinHeap(init_values)
+    # Created lazily so the object can be built outside of a running event loop
+    self._lock: Optional[asyncio.Lock] = None
+    self._not_empty: Optional[asyncio.Condition] = None
+    self._not_full: Optional[asyncio.Condition] = None
+    # Tasks blocked in get/put, so the *_nowait variants only notify when someone is waiting
+    self._waiting_getters = 0
+    self._waiting_putters = 0
+    self._notify_tasks: Set[asyncio.Task] = set()
+
+  def _get_lock(self) -> asyncio.Lock:
+    if self._lock is None:
+      self._lock = asyncio.Lock()
+      self._not_empty = asyncio.Condition(self._lock)
+      self._not_full = asyncio.Condition(self._lock)
+    return self._lock
+
+  def qsize(self) -> int:
+    return len(self._heap)
+
+  def _is_full(self) -> bool:
+    return 0 < self.maxsize <= len(self._heap)
+
+  async def put(self, item, timeout: Optional[float] = None):
+    async with self._get_lock():
+      if self._is_full():
+        self._waiting_putters += 1
+        try:
+          await asyncio.wait_for(self._not_full.wait_for(lambda: not self._is_full()), timeout)
+        except asyncio.TimeoutError:
+          # A slot may have opened as the timeout fired, and its notify was meant for this task
+          if self._is_full():
+            raise
+        except asyncio.CancelledError:
+          # Cancelled after being notified drops the wakeup, so pass it on as asyncio.Queue does
+          if not self._is_full() and self._waiting_putters > 1:
+            self._not_full.notify()
+          raise
+        finally:
+          self._waiting_putters -= 1
+      self._heap.insert(item)
+      self._not_empty.notify()
+
+  async def get(self, timeout: Optional[float] = None):
+    async with self._get_lock():
+      if len(self._heap) == 0:
+        self._waiting_getters += 1
+        try:
+          await asyncio.wait_for(self._not_empty.wait_for(lambda: len(self._heap) > 0), timeout)
+        except asyncio.TimeoutError:
+          # An item may have arrived as the timeout fired, and its notify was meant for this task
+          if len(self._heap) == 0:
+            raise
+        except asyncio.CancelledError:
+          # Cancelled after being notified drops the wakeup, so pass it on as asyncio.Queue does
+          if len(self._heap) > 0 and self._waiting_getters > 1:
+            self._not_empty.notify()
+          raise
+        finally:
+          self._waiting_getters -= 1
+      item = self._heap.extract_min()
+      self._not_full.notify()
+      return item
+
+  def put_nowait(self, item):
+    if self._is_full():
+      raise asyncio.QueueFull
+    self._heap.insert(item)
+    if self._waiting_getters:
+      self._notify_soon(self._not_empty)
+
+  def get_nowait(self):
+    if len(self._heap) == 0:
+      raise asyncio.QueueEmpty
+    item = self._heap.extract_min()
+    if self._waiting_putters:
+      self._notify_soon(self._not_full)
+    return item
+
+  def _notify_soon(self, condition: asyncio.Condition):
+    # Waiters must be notified while holding the lock, which a sync method cannot await.
+    # The loop only keeps weak references to tasks, so hold on to them until they finish
+    task = asyncio.get_running_loop().create_task(self._notify(condition))
+    self._notify_tasks.add(task)
+    task.add_done_callback(self._notify_tasks.discard)
+
+  async def _notify(self, condition: asyncio.Condition):
+    async with condition:
+      condition.notify()
+
+def _latency_summary(latencies: List[float], elapsed: float) -> Dict[str, float]:
+  latencies.sort()
+  return {'throughput_items_per_s': len(latencies) / elapsed,
+          'p50_latency_s': latencies[len(latencies) // 2],
+          'p99_latency_s': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]}
+
+def benchmark_thread_contention(producers: int = 4, consumers: int = 4, items_per_producer: int = 20000,
+                                maxsize: int = 1024, seed: int = 0) -> Dict[str, float]:
+  """Measure ThreadSafeMinHeap throughput and latency with N producer and M consumer threads
+
+  Latency is the time from put to get for each item (queueing plus waits).
+
+  :return: Items per second, and p50/p99 put-to-get latency in seconds
+  """
+  q = ThreadSafeMinHeap(maxsize=maxsize)
+  sequence = itertools.count()
+  total_items = producers * items_per_producer
+  latencies: List[List[float]] = [[] for _ in range(consumers)]
+  done = object()
+
+  def produce(producer_idx: int):
+    rng = random.Random(seed + producer_idx)
+    for _ in range(items_per_producer):
+      q.put((rng.randrange(1000), next(sequence), time.perf_counter()))
+
+  def consume(consumer_idx: int):
+    while True:
+      item = q.get()
+      if item[2] is done:
+        return
+      latencies[consumer_idx].append(time.perf_counter() - item[2])
+
+  threads = ([threading.Thread(target=produce, args=(i,)) for i in range(producers)] +
+             [threading.Thread(target=consume, args=(i,)) for i in range(consumers)])
+  tic = time.perf_counter()
+  for thread in threads:
+    thread.start()
+  for thread in threads[:producers]:
+    thread.join()
+  # Sentinels sort after every real item
+  for _ in range(consumers):
+    q.put((float('inf'), next(sequence), done))
+  for thread in threads[producers:]:
+    thread.join()
+  elapsed = time.perf_counter() - tic
+
+  all_latencies = [latency for consumer in latencies for latency in consumer]
+  assert len(all_latencies) == total_items
+  return _latency_summary(all_latencies, elapsed)
+
+def benchmark_async_contention(producers: int = 4, consumers: int = 4, items_per_producer: int = 20000,
+                               maxsize: int = 1024, seed: int = 0) -> Dict[str, float]:
+  """Measure AsyncMinHeap throughput and latency with N producer and M consumer tasks
+
+  :return: Items per second, and p50/p99 put-to-get latency in seconds
+  """
+  async def run() -> Dict[str, float]:
+    q = AsyncMinHeap(maxsize=maxsize)
+    sequence = itertools.count()
+    latencies: List[float] = []
+    done = object()
+
+    async def produce(producer_idx: int):
+      rng = random.Random(seed + producer_idx)
+      for _ in range(items_per_producer):
+        await q.put((rng.randrange(1000), next(sequence), time.perf_counter()))
+
+    async def consume():
+      while True:
+        item = await q.get()
+        if item[2] is done:
+          return
+        latencies.append(time.perf_counter() - item[2])
+
+    tic = time.perf_counter()
+    consumer_tasks = [asyncio.create_task(consume()) for _ in range(consumers)]
+    await asyncio.gather(*(produce(i) for i in range(producers)))
+    for _ in range(consumers):
+      await q.put((float('inf'), next(sequence), done))
+    await asyncio.gather(*consumer_tasks)
+    elapsed = time.perf_counter() - tic
+    assert len(latencies) == producers * items_per_producer
+    return _latency_summary(latencies, elapsed)
+
+  return asyncio.run(run())
+
+def test_thread_safe_min_heap_orders_and_times_out():
+  q = ThreadSafeMinHeap([5, 1], maxsize=3)
+  q.put(3)
+  with pytest.raises(queue.Full):
+    q.put(0, timeout=0.01)
+  with pytest.raises(queue.Full):
+    q.put_nowait(0)
+  assert [q.get(), q.get(), q.get()] == [1, 3, 5]
+  with pytest.raises(queue.Empty):
+    q.get(timeout=0.01)
+  with pytest.raises(queue.Empty):
+    q.get_nowait()
+
+def test_thread_safe_min_heap_backpressure():
+  q = ThreadSafeMinHeap(maxsize=1)
+  q.put(2)
+  producer = threading.Thread(target=q.put, args=(1,))
+  producer.start()
+  producer.join(timeout=0.05)
+  assert producer.is_alive()
+  assert q.get() == 2
+  producer.join(timeout=1)
+  assert not producer.is_alive()
+  assert q.get(timeout=1) == 1
+
+def test_thread_safe_min_heap_many_threads():
+  results = benchmark_thread_contention(producers=3, consumers=2, items_per_producer=500, maxsize=8)
+  assert results['throughput_items_per_s'] > 0
+
+def test_async_min_heap():
+  async def run():
+    q = AsyncMinHeap(maxsize=2)
+    await q.put(4)
+    q.put_nowait(2)
+    with pytest.raises(asyncio.QueueFull):
+      q.put_nowait(1)
+    with pytest.raises(asyncio.TimeoutError):
+      await q.put(1, timeout=0.01)
+    blocked_put = asyncio.create_task(q.put(3))
+    await asyncio.sleep(0)
+    assert not blocked_put.done()
+    assert await q.get() == 2
+    await blocked_put
+    assert [q.get_nowait(), await q.get()] == [3, 4]
+    with pytest.raises(asyncio.QueueEmpty):
+      q.get_nowait()
+    waiting_get = asyncio.create_task(q.get())
+    await asyncio.sleep(0)
+    q.put_nowait(7)
+    assert await asyncio.wait_for(waiting_get, 1) == 7
+  asyncio.run(run())
+
+def test_async_min_heap_wakes_one_waiter_per_item():
+  async def run():
+    q = AsyncMinHeap(maxsize=1)
+    getters = [asyncio.create_task(q.get()) for _ in range(3)]
+    await asyncio.sleep(0)
+    await q.put(5)
+    await asyncio.sleep(0)
+    assert sum(getter.done() for getter in getters) == 1
+    q.put_nowait(6)
+    await asyncio.sleep(0.01)
+    assert sum(getter.done() for getter in getters) == 2
+    await q.put(7)
+    assert sorted(await asyncio.gather(*getters)) == [5, 6, 7]
+    await q.put(1)
+    putter = asyncio.create_task(q.put(2))
+    await asyncio.sleep(0)
+    assert q.get_nowait() == 1
+    await asyncio.wait_for(putter, 1)
+    assert q.get_nowait() == 2 and not q._notify_tasks
+  asyncio.run(run())
+
+def test_async_min_heap_cancelled_waiter_passes_on_wakeup():
+  async def run():
+    q = AsyncMinHeap(maxsize=1)
+    getters = [asyncio.create_task(q.get()) for _ in range(2)]
+    await asyncio.sleep(0)
+    await q.put(1)
+    getters[0].cancel()
+    assert await asyncio.wait_for(getters[1], 1) == 1
+    assert getters[0].cancelled()
+    await q.put(2)
+    putters = [asyncio.create_task(q.put(value)) for value in (3, 4)]
+    await asyncio.sleep(0)
+    assert await q.get() == 2
+    putters[0].cancel()
+    await asyncio.wait_for(putters[1], 1)
+    assert putters[0].cancelled() and q.get_nowait() == 4
+  asyncio.run(run())
+
+def test_async_min_heap_many_tasks():
+  results = benchmark_async_contention(producers=3, consumers=2, items_per_producer=500, maxsize=8)
+  assert results['throughput_items_per_s'] > 0
+
+if (__name__ == '__main__'):
+  pytest.main(["--durations", "0"])
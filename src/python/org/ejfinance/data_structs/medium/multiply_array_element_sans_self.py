@@ -1,8 +1,17 @@
 # Normally write this in file in source code folder
 
-from typing import List
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
 import pytest
 
+from ..instrumentation import active_stats, instrumented, timed_function
+
 def multiply_all_except_self(multipliers: List[float]) -> List[float]:
   """Apply custom multiplication routine to input list
 
@@ -49,6 +58,259 @@ def multiply_all_except_self(multipliers: List[float]) -> List[float]:
   
   return outcome
 
+def _exclusive_scans(values: np.ndarray, ufunc: np.ufunc, identity) -> Tuple[np.ndarray, np.ndarray]:
+  # Scan along the last axis that excludes the current element, from the left and from the right
+  prefix = np.empty_like(values)
+  prefix[..., 0] = identity
+  ufunc.accumulate(values[..., :-1], axis=-1, out=prefix[..., 1:])
+  suffix = np.empty_like(values)
+  suffix[..., -1] = identity
+  ufunc.accumulate(values[..., :0:-1], axis=-1, out=suffix[..., -2::-1])
+  stats = active_stats()
+  if stats is not None:
+    stats.add('product_except_self.scans', 2)
+    stats.add('product_except_self.allocated_bytes', prefix.nbytes + suffix.nbytes)
+  return (prefix, suffix)
+
+@timed_function('product_except_self.numpy')
+def multiply_all_except_self_numpy(multipliers, axis: int = -1) -> np.ndarray:
+  """Vectorized multiply_all_except_self without any division
+
+  :param multipliers: Array (any number of dimensions) of multipliers
+  :param axis: Axis along which products are taken, so each 1-D slice along it is
+    an independent input (e.g., axis=1 for one input per row of a 2-D batch)
+  :return: Array of the same shape and dtype as the input (int or float). Int64
+    products can overflow; use multiply_all_except_self_exact for those
+
+  Approach:
+    1) Exclusive prefix products (product of everything left of i) and exclusive
+       suffix products (right of i), each one np.multiply.accumulate
+    2) output[i] = prefix[i] * suffix[i]. Floats lose no precision to a division
+    3) Zeros are counted per slice and scanned as ones, since an overflowed scan
+       times zero is nan instead of 0. With one zero in a slice, only its position
+       keeps the product (of the non-zero values); with more, the slice is all 0
+  """
+  values = np.asarray(multipliers)
+  if values.size == 0 or values.ndim == 0:
+    raise ValueError("Input was null or empty.")
+  values = np.moveaxis(values, axis, -1)
+  is_zero = values == 0
+  stats = active_stats()
+  if stats is not None:
+    stats.add('product_except_self.elements', values.size)
+    stats.add('product_except_self.allocated_bytes', is_zero.nbytes)
+  if not is_zero.any():
+    (prefix, suffix) = _exclusive_scans(values, np.multiply, 1)
+    prefix *= suffix
+    return np.moveaxis(prefix, -1, axis)
+
+  zero_counts = np.count_nonzero(is_zero, axis=-1)[..., np.newaxis]
+  (prefix, suffix) = _exclusive_scans(np.where(is_zero, 1, values).astype(values.dtype, copy=False),
+                                      np.multiply, 1)
+  prefix *= suffix
+  prefix[~((zero_counts == 0) | ((zero_counts == 1) & is_zero))] = 0
+  return np.moveaxis(prefix, -1, axis)
+
+@timed_function('product_except_self.log')
+def multiply_all_except_self_log(multipliers, axis: int = -1) -> Tuple[np.ndarray, np.ndarray]:
+  """Log-domain multiply_all_except_self for long float vectors
+
+  Products of many floats overflow to inf or underflow to 0. This returns them as
+  sign * exp(log_magnitude) instead, which stays finite for any input length.
+
+  :param multipliers: Array (any number of dimensions) of multipliers
+  :param axis: Axis along which products are taken
+  :return: (sign, log_magnitude) arrays with the input's shape. sign is -1, 0 or 1;
+    log_magnitude is -inf where the product is zero
+
+  Approach:
+    1) Exclusive prefix/suffix sums of log|x| (np.add.accumulate) and exclusive
+       prefix/suffix products of sign(x). Zeros contribute -inf and sign 0, and no
+       value is ever subtracted, so there is no inf - inf
+  """
+  values = np.asarray(multipliers, dtype=np.float64)
+  if values.size == 0 or values.ndim == 0:
+    raise ValueError("Input was null or empty.")
+  values = np.moveaxis(values, axis, -1)
+  with np.errstate(divide='ignore'):
+    log_magnitudes = np.log(np.abs(values))
+  signs = np.sign(values)
+  stats = active_stats()
+  if stats is not None:
+    stats.add('product_except_self.elements', values.size)
+    # np.abs makes a temporary the size of log_magnitudes
+    stats.add('product_except_self.allocated_bytes', 2 * log_magnitudes.nbytes + signs.nbytes)
+  (log_prefix, log_suffix) = _exclusive_scans(log_magnitudes, np.add, 0.0)
+  (sign_prefix, sign_suffix) = _exclusive_scans(signs, np.multiply, 1.0)
+  log_prefix += log_suffix
+  sign_prefix *= sign_suffix
+  return (np.moveaxis(sign_prefix, -1, axis), np.moveaxis(log_prefix, -1, axis))
+
+def _exact_value(value: Union[int, Fraction, float, np.number]) -> Union[int, Fraction]:
+  # NumPy scalars would wrap (ints) or round (floats) in the running products
+  if isinstance(value, (float, np.floating)):
+    return Fraction(float(value))
+  if isinstance(value, np.integer):
+    return int(value)
+  return value
+
+def multiply_all_except_self_exact(multipliers: Iterable[Union[int, Fraction, float]]) -> List[Union[int, Fraction]]:
+  """Exact multiply_all_except_self using Python ints and Fractions
+
+  :param multipliers: ints, Fractions or floats, or a 1-D NumPy array or NumPy scalars
+    (floats are converted to their exact Fraction, NumPy ints to Python ints)
+  :return: Exact products (int if every input is an int, else Fraction)
+
+  Approach:
+    1) Exclusive prefix products, then a backward pass multiplying in the suffix
+       product. Arbitrary precision, so no overflow and no rounding
+  """
+  if isinstance(multipliers, np.ndarray):
+    multipliers = multipliers.tolist()
+  values = [_exact_value(m) for m in multipliers]
+  if not values:
+    raise ValueError("Input was null or empty.")
+  outcome = [1] * len(values)
+  running = 1
+  for idx in range(len(values)):
+    outcome[idx] = running
+    running *= values[idx]
+  running = 1
+  for idx in range(len(values) - 1, -1, -1):
+    outcome[idx] *= running
+    running *= values[idx]
+  return outcome
+
+def benchmark_multiply_all_except_self(sizes: Iterable[int] = (10**2, 10**3, 10**4, 10**6),
+                                       seed: int = 0) -> Dict[int, Dict[str, float]]:
+  """Time each multiply_all_except_self implementation on random floats near 1
+
+  :return: Seconds taken per input size and implementation
+  """
+  rng = np.random.default_rng(seed)
+  timings: Dict[int, Dict[str, float]] = {}
+  for size in sizes:
+    values = rng.uniform(0.5, 1.5, size=size)
+    values_list = values.tolist()
+    timings[size] = {}
+    for (name, implementation, data) in (('current', multiply_all_except_self, values_list),
+                                         ('numpy', multiply_all_except_self_numpy, values),
+                                         ('log', multiply_all_except_self_log, values),
+                                         ('exact', multiply_all_except_self_exact, values_list)):
+      # Exact products of n floats grow to about 53 * n bits, so only small inputs
+      if name == 'exact' and size > 10**3:
+        continue
+      tic = time.perf_counter()
+      implementation(data)
+      timings[size][name] = time.perf_counter() - tic
+  return timings
+
+def _chunk_summary(task: Tuple[str, int, int]) -> Tuple[np.generic, int]:
+  # Product of the non-zero values, and zero count, of one chunk of a .npy file read
+  # through a memory map. The product stays in the input dtype (int64 wraps, as in
+  # multiply_all_except_self_numpy)
+  (input_path, start, end) = task
+  chunk = np.asarray(np.load(input_path, mmap_mode='r')[start:end])
+  is_zero = chunk == 0
+  return (np.multiply.reduce(chunk[~is_zero], dtype=chunk.dtype), int(np.count_nonzero(is_zero)))
+
+def _chunk_write(task: Tuple[str, str, int, int, np.generic, np.generic]) -> None:
+  # Output for one chunk: exclusive in-chunk scans times the products of all
+  # non-zero values before (left_product) and after (right_product) the chunk.
+  # Zeros are scanned as ones; with a zero in the chunk (the only one in the
+  # input), every other position is 0
+  (input_path, output_path, start, end, left_product, right_product) = task
+  chunk = np.asarray(np.load(input_path, mmap_mode='r')[start:end])
+  is_zero = chunk == 0
+  has_zero = bool(is_zero.any())
+  if has_zero:
+    chunk = np.where(is_zero, 1, chunk).astype(chunk.dtype, copy=False)
+  (prefix, suffix) = _exclusive_scans(chunk, np.multiply, 1)
+  prefix *= suffix
+  prefix *= left_product
+  prefix *= right_product
+  if has_zero:
+    prefix[~is_zero] = 0
+  output = np.load(output_path, mmap_mode='r+')
+  output[start:end] = prefix
+  output.flush()
+
+def multiply_all_except_self_out_of_core(input_path: str, output_path: str, chunk_size: int = 1 << 22,
+                                         processes: Optional[int] = None) -> None:
+  """multiply_all_except_self for a .npy file larger than memory
+
+  :param input_path: 1-D .npy file of multipliers (read through a memory map)
+  :param output_path: .npy file to create with the results (same shape and dtype)
+  :param chunk_size: Values per task. Peak memory is a few chunks per process,
+    whatever the input size
+  :param processes: Worker processes (defaults to the number of CPUs)
+
+  Approach:
+    1) In parallel, summarize every chunk as (product of non-zero values, zero count)
+    2) Exclusive prefix/suffix scans over the chunk products, in the input dtype, give
+       for each chunk the product of everything before it and after it. With two or
+       more zeros in the input every output is zero, so the output is zero filled
+       without a second pass. With one zero, only the position of the zero is non-zero,
+       so the output is zero filled and only the chunk holding it is written
+    3) In parallel, each chunk writes prefix * suffix (in chunk) * product before *
+       product after into the memory-mapped output. No division, as in
+       multiply_all_except_self_numpy
+  """
+  values = np.load(input_path, mmap_mode='r')
+  if values.ndim != 1 or len(values) == 0:
+    raise ValueError("Input must be a non-empty 1-D array.")
+  size = len(values)
+  bounds = [(start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
+  dtype = values.dtype
+  output = np.lib.format.open_memmap(output_path, mode='w+', dtype=dtype, shape=values.shape)
+  del values
+
+  with ProcessPoolExecutor(max_workers=processes) as pool:
+    summaries = list(pool.map(_chunk_summary, [(input_path, start, end) for (start, end) in bounds]))
+    zero_counts = [zero_count for (_, zero_count) in summaries]
+    if sum(zero_counts) > 0:
+      for (start, end) in bounds:
+        output[start:end] = 0
+      output.flush()
+    del output
+    if sum(zero_counts) > 1:
+      return
+
+    products = np.array([product for (product, _) in summaries], dtype=dtype)
+    (left_products, right_products) = _exclusive_scans(products, np.multiply, 1)
+    tasks = [(input_path, output_path, start, end, left_products[idx], right_products[idx])
+             for (idx, (start, end)) in enumerate(bounds) if sum(zero_counts) == 0 or zero_counts[idx]]
+    list(pool.map(_chunk_write, tasks))
+
+def benchmark_out_of_core(size: int = 50_000_000, process_counts: Optional[Iterable[int]] = None,
+                          chunk_size: int = 1 << 22, directory: Optional[str] = None,
+                          seed: int = 0) -> Dict[int, float]:
+  """Time multiply_all_except_self_out_of_core on a float64 .npy file across process counts
+
+  :param process_counts: Defaults to 1, 2, 4, ... up to the number of CPUs
+  :return: Seconds taken per process count
+  """
+  if process_counts is None:
+    process_counts = [1 << power for power in range((os.cpu_count() or 1).bit_length())]
+  timings: Dict[int, float] = {}
+  with tempfile.TemporaryDirectory(dir=directory) as tmp_dir:
+    input_path = os.path.join(tmp_dir, 'multipliers.npy')
+    output_path = os.path.join(tmp_dir, 'products.npy')
+    multipliers = np.lib.format.open_memmap(input_path, mode='w+', dtype=np.float64, shape=(size,))
+    rng = np.random.default_rng(seed)
+    for start in range(0, size, chunk_size):
+      end = min(start + chunk_size, size)
+      # Values near 1 so the products stay finite
+      multipliers[start:end] = 1 + rng.standard_normal(end - start) * 1e-4
+    multipliers.flush()
+    del multipliers
+
+    for processes in process_counts:
+      tic = time.perf_counter()
+      multiply_all_except_self_out_of_core(input_path, output_path, chunk_size, processes)
+      timings[processes] = time.perf_counter() - tic
+  return timings
+
 # Normally write this in file in test folder
 
 # Set up test fixture (e.g., pytest test fixture) and call unit under test
@@ -61,5 +323,90 @@ def multiply_all_except_self(multipliers: List[float]) -> List[float]:
 def test_multiply_all_except_self_on_garbage(test_input, expected):
   assert multiply_all_except_self(test_input) == expected, 'Test case failed.'
 
+@pytest.mark.parametrize("test_input, expected",
+  [pytest.param([0, 4, 8], [32, 0, 0]),
+   pytest.param([0, 4, 8, 0], [0, 0, 0, 0]),
+   pytest.param([9, -4, 8], [-32, 72, -36]),
+   pytest.param([7], [1])])
+def test_multiply_all_except_self_vectorized_and_exact(test_input, expected):
+  assert multiply_all_except_self_numpy(test_input).tolist() == expected
+  assert multiply_all_except_self_exact(test_input) == expected
+  (sign, log_magnitude) = multiply_all_except_self_log(test_input)
+  assert np.allclose(sign * np.exp(log_magnitude), expected)
+
+@pytest.mark.parametrize("test_input",
+  [pytest.param([1e200, 1e200, 0.0, 1.0]),
+   pytest.param([1e200, 0.0, 1e200, 0.0]),
+   pytest.param([0.0, 1e-200, 1e-200, 3.0])])
+def test_multiply_all_except_self_numpy_overflow_with_zeros(test_input):
+  with np.errstate(over='ignore', under='ignore'):
+    result = multiply_all_except_self_numpy(test_input)
+  assert result.tolist() == multiply_all_except_self(test_input)
+  batch = np.array([test_input, [2.0, 3.0, 4.0, 5.0]])
+  with np.errstate(over='ignore', under='ignore'):
+    assert multiply_all_except_self_numpy(batch, axis=1)[0].tolist() == result.tolist()
+    assert multiply_all_except_self_numpy(batch.T, axis=0)[:, 1].tolist() == [60.0, 40.0, 30.0, 24.0]
+
+def test_multiply_all_except_self_numpy_axis():
+  batch = np.array([[1.5, 2.0, 0.0], [3.0, -1.0, 2.0]])
+  assert multiply_all_except_self_numpy(batch, axis=1).tolist() == [[0.0, 0.0, 3.0], [-2.0, 6.0, -3.0]]
+  assert multiply_all_except_self_numpy(batch, axis=0).tolist() == [[3.0, -1.0, 2.0], [1.5, 2.0, 0.0]]
+
+def test_multiply_all_except_self_instrumentation():
+  values = np.arange(1, 11, dtype=np.float64)
+  with instrumented() as stats:
+    multiply_all_except_self_numpy(values)
+    multiply_all_except_self_log(values)
+  # The numpy engine's zero mask is one byte per value
+  assert stats.counters == {'product_except_self.elements': 20, 'product_except_self.scans': 6,
+                            'product_except_self.allocated_bytes': 6 * values.nbytes + 3 * values.nbytes + 10}
+  assert set(stats.timers) == {'product_except_self.numpy', 'product_except_self.log'}
+  multiply_all_except_self_numpy(values)
+  assert stats.counters['product_except_self.elements'] == 20
+
+def test_multiply_all_except_self_long_inputs():
+  values = [10.0] * 400 + [-0.5]
+  (sign, log_magnitude) = multiply_all_except_self_log(values)
+  assert sign[-1] == 1 and np.isclose(log_magnitude[-1], 400 * np.log(10))
+  assert sign[0] == -1 and np.isclose(log_magnitude[0], 399 * np.log(10) + np.log(0.5))
+  exact = multiply_all_except_self_exact([3] * 100 + [Fraction(1, 3), 0.5])
+  assert exact[0] == 3**99 * Fraction(1, 6)
+  assert exact[-1] == 3**99
+
+def test_multiply_all_except_self_exact_numpy_input():
+  values = np.array([10**6] * 4 + [3], dtype=np.int64)
+  assert multiply_all_except_self_exact(values) == [3 * 10**18] * 4 + [10**24]
+  assert multiply_all_except_self_exact(list(values)) == [3 * 10**18] * 4 + [10**24]
+  assert multiply_all_except_self_exact(np.array([0.1, 3.0], dtype=np.float32)) == [3, Fraction(float(np.float32(0.1)))]
+
+@pytest.mark.parametrize("test_input",
+  [pytest.param([1.5, -2.0, 3.0, 0.5, 4.0, 2.0, -1.0]),
+   pytest.param([1.5, -2.0, 0.0, 0.5, 4.0, 2.0, -1.0]),
+   pytest.param([1.5, 0.0, 3.0, 0.5, 4.0, 0.0, -1.0]),
+   pytest.param([2.0])])
+def test_multiply_all_except_self_out_of_core(test_input, tmp_path):
+  input_path, output_path = str(tmp_path / 'in.npy'), str(tmp_path / 'out.npy')
+  np.save(input_path, np.array(test_input))
+  multiply_all_except_self_out_of_core(input_path, output_path, chunk_size=3, processes=2)
+  assert np.allclose(np.load(output_path), multiply_all_except_self_numpy(test_input))
+
+def test_multiply_all_except_self_out_of_core_overflow_with_zero(tmp_path):
+  input_path, output_path = str(tmp_path / 'in.npy'), str(tmp_path / 'out.npy')
+  test_input = [1e200] * 4 + [0.0] + [1.0] * 3
+  np.save(input_path, np.array(test_input))
+  with np.errstate(over='ignore'):
+    multiply_all_except_self_out_of_core(input_path, output_path, chunk_size=2, processes=1)
+  assert np.load(output_path).tolist() == multiply_all_except_self(test_input)
+
+def test_multiply_all_except_self_out_of_core_int64(tmp_path):
+  input_path, output_path = str(tmp_path / 'in.npy'), str(tmp_path / 'out.npy')
+  # Products overflow int64, and wrap the same way as the in-memory engine
+  test_input = np.array([10**6, -3, 7, 10**5, 2, 10**6, 9, 10**4], dtype=np.int64)
+  np.save(input_path, test_input)
+  multiply_all_except_self_out_of_core(input_path, output_path, chunk_size=3, processes=1)
+  result = np.load(output_path)
+  assert result.dtype == np.int64
+  assert result.tolist() == multiply_all_except_self_numpy(test_input).tolist()
+
 if (__name__ == '__main__'):
   pytest.main(["--durations", "0"])
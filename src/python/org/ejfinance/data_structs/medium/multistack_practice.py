@@ -1,4 +1,5 @@
-from typing import List
+import time
+from typing import Dict, Iterable, List
 
 import pytest
 import numpy as np
@@ -20,29 +21,160 @@ Examples:
 Approach:
   1) Write Multistack class backed by a single dimensional array
     1a) Partition the single array where each stack will live in one partition
+  2) Elastic mode (elastic=True) - A full stack never rejects a push. It borrows free
+    slots (at least capacity / (2 * number of stacks)) from its neighbours by shifting
+    partition boundaries and the segments in between in place, and the whole buffer
+    doubles only when the free slots of all stacks together are not enough. Skewed
+    workloads then share one buffer instead of each stack reserving its worst case
+  3) The value dtype is configurable (float64 by default)
 
 Runtime:
-  Push runtime complexity: O(1)
+  Push runtime complexity: O(1) (amortized in elastic mode: a borrow moves at most
+    capacity values and gives the stack capacity / (2 * number of stacks) slots, which
+    must be pushed before it borrows again; growth doubles the buffer)
   Pop runtime complexity: O(1)
   Peek runtime complexity: O(1)
 """
 class MultiStack:
-  def __init__(self, number_stacks, per_stack_size):
+  def __init__(self, number_stacks, per_stack_size, elastic: bool = False, dtype=np.float64):
     self._number_stacks = number_stacks
     self._per_stack_size = per_stack_size
-    self._values: np.ndarray = np.empty(per_stack_size * number_stacks, dtype=np.float64)
+    self._elastic = elastic
+    self._values: np.ndarray = np.empty(per_stack_size * number_stacks, dtype=dtype)
     self._sizes: List[int] = [0] * number_stacks
     self.stack_start_idxs: List[int] = [int(i * per_stack_size) for i in range(number_stacks)]
     self.stack_end_idxs: List[int] = [int(i * per_stack_size) + per_stack_size for i in range(number_stacks)]
 
+  @property
+  def dtype(self) -> np.dtype:
+    return self._values.dtype
+
+  @property
+  def capacity(self) -> int:
+    return len(self._values)
+
   def push(self, stack_number: int, value: float):
     if (self.is_stack_full(stack_number)):
-      return Exception(f"Stack {stack_number} is full.")
+      if not self._elastic:
+        return Exception(f"Stack {stack_number} is full.")
+      self._make_room(stack_number)
 
     (self._values[self.stack_start_idxs[stack_number] +
                   self._sizes[stack_number]]) = value
     self._sizes[stack_number] += 1
 
+  def push_many(self, stack_number: int, values: np.ndarray):
+    """Push all values onto one stack with a single slice assignment (values[-1] ends on top)
+
+    Unlike push, raises (rather than returns) an Exception when a fixed-size stack lacks room.
+    """
+    values = np.asarray(values, dtype=self._values.dtype).ravel()
+    start, size = self.stack_start_idxs[stack_number], self._sizes[stack_number]
+    if start + size + len(values) > self.stack_end_idxs[stack_number]:
+      if not self._elastic:
+        raise Exception(f"Stack {stack_number} does not have room for {len(values)} values.")
+      self._make_room(stack_number, len(values))
+      start = self.stack_start_idxs[stack_number]
+
+    self._values[start + size:start + size + len(values)] = values
+    self._sizes[stack_number] += len(values)
+
+  def pop_many(self, stack_number: int, k: int) -> np.ndarray:
+    """Pop k values from one stack with a single slice copy, in pop order (top first)"""
+    if k < 0:
+      raise ValueError("Number of values to pop must be non-negative.")
+    if k > self._sizes[stack_number]:
+      raise Exception(f"Stack {stack_number} has fewer than {k} values.")
+
+    end = self.stack_start_idxs[stack_number] + self._sizes[stack_number]
+    self._sizes[stack_number] -= k
+    return self._values[end - k:end][::-1].copy()
+
+  def view(self, stack_number: int) -> np.ndarray:
+    """Read-only, zero-copy view of a stack's live values, bottom to top
+
+    The view is not updated by later pushes or pops. In elastic mode a push can move
+    the stack within the buffer, or to a new buffer, so take a new view after pushing.
+    """
+    start = self.stack_start_idxs[stack_number]
+    live_values = self._values[start:start + self._sizes[stack_number]]
+    live_values.flags.writeable = False
+    return live_values
+
+  def _make_room(self, stack_number: int, needed: int = 1):
+    """Give a full stack (elastic mode) room for needed more values, and slack
+
+    The stack gets at least capacity / (2 * number of stacks) new slots. They are
+    borrowed from the free slots of the neighbours, nearest first on the right, then on
+    the left, by shifting only the segments between the lender and the stack in place.
+    Only when the other stacks do not have enough free slots does the buffer grow
+    (at least doubling), with the new slots given to this stack.
+    """
+    (starts, ends, sizes) = (self.stack_start_idxs, self.stack_end_idxs, self._sizes)
+    free = [end - start - size for (start, end, size) in zip(starts, ends, sizes)]
+    capacity = len(self._values)
+    extra = max(needed - free[stack_number], capacity // (2 * self._number_stacks), 1)
+    if sum(free) - free[stack_number] < extra:
+      self._grow(stack_number, max(capacity, extra))
+      return
+
+    borrowed = self._borrow_right(stack_number, extra, free)
+    if borrowed < extra:
+      self._borrow_left(stack_number, extra - borrowed, free)
+
+  def _move(self, src_start: int, dst_start: int, length: int):
+    # Move one stack's live values within the buffer (NumPy handles the overlap)
+    if length and src_start != dst_start:
+      self._values[dst_start:dst_start + length] = self._values[src_start:src_start + length]
+
+  def _borrow_right(self, stack_number: int, wanted: int, free: List[int]) -> int:
+    # Take free slots from stacks after stack_number. Stack i moves right by the
+    # slots taken from it and every lender after it; moving the farthest first keeps
+    # values from being overwritten
+    (starts, ends, sizes) = (self.stack_start_idxs, self.stack_end_idxs, self._sizes)
+    takes: List[int] = []
+    for idx in range(stack_number + 1, self._number_stacks):
+      if sum(takes) == wanted:
+        break
+      takes.append(min(free[idx], wanted - sum(takes)))
+    shift_after = 0
+    for idx in reversed(range(stack_number + 1, stack_number + 1 + len(takes))):
+      shift = shift_after + takes[idx - stack_number - 1]
+      self._move(starts[idx], starts[idx] + shift, sizes[idx])
+      starts[idx] += shift
+      ends[idx] += shift_after
+      shift_after = shift
+    ends[stack_number] += shift_after
+    return shift_after
+
+  def _borrow_left(self, stack_number: int, wanted: int, free: List[int]):
+    # Take free slots from stacks before stack_number, nearest first. Stacks from
+    # the farthest lender up to stack_number move left, the leftmost first
+    (starts, ends, sizes) = (self.stack_start_idxs, self.stack_end_idxs, self._sizes)
+    takes: Dict[int, int] = {}
+    for idx in range(stack_number - 1, -1, -1):
+      if sum(takes.values()) == wanted:
+        break
+      takes[idx] = min(free[idx], wanted - sum(takes.values()))
+    shift = 0
+    for idx in range(min(takes, default=stack_number), stack_number):
+      shift += takes[idx]
+      ends[idx] -= shift
+      self._move(starts[idx + 1], starts[idx + 1] - shift, sizes[idx + 1])
+      starts[idx + 1] -= shift
+
+  def _grow(self, stack_number: int, extra: int):
+    # Copy to a buffer with extra more slots, all at the end of stack_number's partition
+    split = self.stack_end_idxs[stack_number]
+    values = np.empty(len(self._values) + extra, dtype=self._values.dtype)
+    values[:split] = self._values[:split]
+    values[split + extra:] = self._values[split:]
+    self._values = values
+    self.stack_end_idxs[stack_number] += extra
+    for idx in range(stack_number + 1, self._number_stacks):
+      self.stack_start_idxs[idx] += extra
+      self.stack_end_idxs[idx] += extra
+
   def peek(self, stack_number: int):
     if (self.is_stack_empty(stack_number)):
       return Exception(f"Stack {stack_number} is empty.")
@@ -60,7 +192,38 @@ class MultiStack:
     return self._sizes[stack_number] == 0
 
   def is_stack_full(self, stack_number: int) -> bool:
-    return self._sizes[stack_number] == self._per_stack_size
+    return (self._sizes[stack_number] ==
+            self.stack_end_idxs[stack_number] - self.stack_start_idxs[stack_number])
+
+def benchmark_bulk_operations(batch_sizes: Iterable[int] = (10, 10**3, 10**5, 10**6),
+                              seed: int = 0) -> Dict[int, Dict[str, float]]:
+  """Time push_many/pop_many against per-element push/pop loops
+
+  :return: Seconds taken per batch size and approach
+  """
+  rng = np.random.default_rng(seed)
+  timings: Dict[int, Dict[str, float]] = {}
+  for batch_size in batch_sizes:
+    values = rng.random(batch_size)
+    ms = MultiStack(3, batch_size)
+    timing = timings[batch_size] = {}
+
+    tic = time.perf_counter()
+    for val in values:
+      ms.push(1, val)
+    timing['push_loop'] = time.perf_counter() - tic
+    tic = time.perf_counter()
+    popped = [ms.pop(1) for _ in range(batch_size)]
+    timing['pop_loop'] = time.perf_counter() - tic
+
+    tic = time.perf_counter()
+    ms.push_many(1, values)
+    timing['push_many'] = time.perf_counter() - tic
+    tic = time.perf_counter()
+    popped_many = ms.pop_many(1, batch_size)
+    timing['pop_many'] = time.perf_counter() - tic
+    assert popped_many.tolist() == popped
+  return timings
 
 class TestMultiStack:
 
@@ -99,5 +262,108 @@ class TestMultiStack:
         assert ms.peek(stack_num) == expected_peeks[assert_idx]
         assert_idx += 1
 
+  def test_elastic_skewed_pushes(self):
+    ms = MultiStack(3, 4, elastic=True, dtype=np.int64)
+    for val in range(100):
+      assert ms.push(1, val) is None
+    ms.push(0, -1)
+    ms.push(2, -2)
+    assert ms.dtype == np.int64
+    assert ms.capacity < 400
+    assert [ms.pop(1) for _ in range(100)] == list(range(99, -1, -1))
+    assert ms.pop(0) == -1 and ms.pop(2) == -2
+    for idx in range(3):
+      assert ms.stack_start_idxs[idx] < ms.stack_end_idxs[idx]
+      assert idx == 0 or ms.stack_end_idxs[idx - 1] <= ms.stack_start_idxs[idx]
+
+  def test_elastic_borrows_before_growing(self):
+    ms = MultiStack(3, 4, elastic=True)
+    for val in range(8):
+      ms.push(0, val)
+    assert ms.capacity == 12
+    assert ms.stack_end_idxs[0] - ms.stack_start_idxs[0] >= 8
+    ms.push(2, 5.5)
+    assert ms.peek(2) == 5.5
+    assert [ms.pop(0) for _ in range(8)] == list(range(7, -1, -1))
+
+  def test_elastic_skewed_pushes_move_little(self, monkeypatch):
+    moved = []
+    original_move = MultiStack._move
+    def counting_move(ms, src_start, dst_start, length):
+      moved.append(length)
+      original_move(ms, src_start, dst_start, length)
+    monkeypatch.setattr(MultiStack, '_move', counting_move)
+
+    ms = MultiStack(3, 4, elastic=True)
+    ms.push_many(1, np.arange(100000))
+    (moved_before, capacity) = (sum(moved), ms.capacity)
+    for step in range(20000):
+      ms.push(2 * (step % 2), step)
+    # Each small stack borrows a few times, with slack proportional to the capacity.
+    # Relaying out the whole buffer per borrow moved ~100 values per push
+    assert sum(moved) - moved_before < 10 * 20000
+    assert ms.capacity <= 2 * capacity
+    assert ms.view(1).tolist() == list(range(100000))
+    assert ms.view(0).tolist() == list(range(0, 20000, 2))
+    assert ms.view(2).tolist() == list(range(1, 20000, 2))
+
+  def test_elastic_borrows_from_left(self):
+    ms = MultiStack(3, 4, elastic=True)
+    ms.push_many(1, [1, 2, 3, 4])
+    ms.push_many(2, [5, 6, 7, 8, 9])
+    assert ms.capacity == 12
+    assert (ms.view(0).tolist(), ms.view(1).tolist(), ms.view(2).tolist()) == ([], [1, 2, 3, 4], [5, 6, 7, 8, 9])
+    assert ms.stack_end_idxs[2] == 12 and ms.stack_end_idxs[0] <= ms.stack_start_idxs[1]
+
+  def test_fixed_mode_rejects_push_on_full_stack(self):
+    ms = MultiStack(2, 1)
+    ms.push(0, 1)
+    assert isinstance(ms.push(0, 2), Exception)
+    assert ms.pop(0) == 1
+
+  @pytest.mark.parametrize("seed", range(3))
+  def test_elastic_matches_lists(self, seed):
+    rng = np.random.default_rng(seed)
+    ms = MultiStack(4, 2, elastic=True)
+    reference = [[] for _ in range(4)]
+    for step in range(2000):
+      stack_number = int(rng.choice(4, p=[0.7, 0.1, 0.1, 0.1]))
+      if reference[stack_number] and rng.random() < 0.3:
+        assert ms.pop(stack_number) == reference[stack_number].pop()
+      else:
+        ms.push(stack_number, step)
+        reference[stack_number].append(step)
+    for stack_number in range(4):
+      assert [ms.pop(stack_number) for _ in reference[stack_number]] == reference[stack_number][::-1]
+
+  @pytest.mark.parametrize("elastic", [False, True])
+  def test_push_many_pop_many_and_view(self, elastic):
+    ms = MultiStack(3, 5, elastic=elastic)
+    ms.push(1, 0)
+    assert ms.push_many(1, np.array([1, 2, 3])) is None
+    ms.push(1, 4)
+    live_values = ms.view(1)
+    assert live_values.tolist() == [0, 1, 2, 3, 4]
+    assert np.shares_memory(live_values, ms._values)
+    with pytest.raises(ValueError):
+      live_values[0] = 9
+    assert ms.pop_many(1, 2).tolist() == [4, 3]
+    assert ms.pop(1) == 2
+    with pytest.raises(Exception, match="fewer than 3"):
+      ms.pop_many(1, 3)
+    with pytest.raises(ValueError):
+      ms.pop_many(1, -2)
+    assert ms.view(1).tolist() == [0, 1]
+    assert ms.view(0).tolist() == []
+
+    if elastic:
+      assert ms.push_many(0, np.arange(12)) is None
+      assert ms.view(0).tolist() == list(range(12))
+      assert ms.view(1).tolist() == [0, 1]
+    else:
+      with pytest.raises(Exception, match="does not have room"):
+        ms.push_many(0, np.arange(12))
+      assert ms.view(0).tolist() == []
+
 if (__name__ == '__main__'):
   pytest.main(["--durations", "0"])
\ No newline at end of file
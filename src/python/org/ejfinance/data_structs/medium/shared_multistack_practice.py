@@ -0,0 +1,232 @@
+import multiprocessing as mp
+import os
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pytest
+
+"""
+Problem statement: Share one set of stacks (as in MultiStack) between worker processes
+
+Assumptions:
+  1) Values are numeric (float64 by default), partitions are fixed size (as in MultiStack
+     without elastic mode), since a shared buffer cannot be resized under attached workers
+  2) Workers either inherit the object (e.g., as a multiprocessing.Process argument) or
+     attach by shared memory name, passing the locks they were given
+
+Examples:
+  1) ms = SharedMultiStack(4, 1000); Process(target=worker, args=(ms,)) -> the worker
+     pushes and pops on the same memory, nothing is pickled per value
+
+Approach:
+  1) One multiprocessing.shared_memory block holds a header (number of stacks, stack size,
+     dtype), the per-stack size counters (int64) and the values, all viewed as ndarrays
+  2) One multiprocessing.Lock per stack, so workers on different stacks never contend.
+     A lock-free scheme would need atomic compare-and-swap on the counters, which NumPy
+     does not provide, so it is not offered
+  3) Pickling the object sends only the block name and the locks; unpickling attaches
+
+Runtime:
+  Push runtime complexity: O(1) plus lock acquisition
+  Pop runtime complexity: O(1) plus lock acquisition
+"""
+_HEADER_FIELDS = 4  # number_stacks, per_stack_size, dtype character code, creator's resource tracker id
+
+def _resource_tracker_id() -> int:
+  # Identifies this process's resource tracker: the inode of the pipe to it, which
+  # processes started through multiprocessing inherit. Only POSIX tracks shared memory
+  if os.name != 'posix':
+    return 0
+  return os.fstat(resource_tracker.getfd()).st_ino
+
+def _attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+  # The resource tracker unlinks blocks still registered when it shuts down, so only
+  # the creator's registration may exist. Python 3.13+ can attach without registering.
+  # Before that, processes started through multiprocessing share the creator's tracker,
+  # where registering again is harmless, and unrelated processes have their own
+  # tracker and must unregister
+  if sys.version_info >= (3, 13):
+    return shared_memory.SharedMemory(name=name, track=False)
+  shm = shared_memory.SharedMemory(name=name)
+  if os.name == 'posix':
+    creator_tracker_id = int(np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=shm.buf)[3])
+    if _resource_tracker_id() != creator_tracker_id:
+      # POSIX blocks are registered under their name with a leading slash
+      resource_tracker.unregister('/' + shm.name, 'shared_memory')
+  return shm
+
+class SharedMultiStack:
+  def __init__(self, number_stacks: int, per_stack_size: int, dtype=np.float64,
+               locks: Optional[List] = None, name: Optional[str] = None):
+    dtype = np.dtype(dtype)
+    if locks is not None and len(locks) != number_stacks:
+      raise ValueError("One lock per stack is required.")
+    self._locks = locks if locks is not None else [mp.Lock() for _ in range(number_stacks)]
+    nbytes = 8 * (_HEADER_FIELDS + number_stacks) + dtype.itemsize * number_stacks * per_stack_size
+    self._shm = shared_memory.SharedMemory(create=True, size=nbytes, name=name)
+    self._owner = True
+    header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=self._shm.buf)
+    header[:] = (number_stacks, per_stack_size, ord(dtype.char), _resource_tracker_id())
+    del header
+    self._map_arrays()
+    self._sizes[:] = 0
+
+  @classmethod
+  def attach(cls, name: str, locks: List) -> 'SharedMultiStack':
+    """Attach to a SharedMultiStack created by another process"""
+    ms = cls.__new__(cls)
+    ms._shm = _attach_shared_memory(name)
+    ms._owner = False
+    ms._locks = locks
+    ms._map_arrays()
+    return ms
+
+  def _map_arrays(self):
+    header = np.ndarray((_HEADER_FIELDS,), dtype=np.int64, buffer=self._shm.buf)
+    (self._number_stacks, self._per_stack_size, dtype_code) = (int(field) for field in header[:3])
+    del header
+    dtype = np.dtype(chr(dtype_code))
+    self._sizes: np.ndarray = np.ndarray((self._number_stacks,), dtype=np.int64, buffer=self._shm.buf,
+                                         offset=8 * _HEADER_FIELDS)
+    self._values: np.ndarray = np.ndarray((self._number_stacks * self._per_stack_size,), dtype=dtype,
+                                          buffer=self._shm.buf,
+                                          offset=8 * (_HEADER_FIELDS + self._number_stacks))
+
+  def __getstate__(self):
+    return {'name': self._shm.name, 'locks': self._locks}
+
+  def __setstate__(self, state):
+    attached = SharedMultiStack.attach(state['name'], state['locks'])
+    self.__dict__.update(attached.__dict__)
+
+  @property
+  def name(self) -> str:
+    return self._shm.name
+
+  @property
+  def locks(self) -> List:
+    return self._locks
+
+  def push(self, stack_number: int, value: float):
+    with self._locks[stack_number]:
+      size = int(self._sizes[stack_number])
+      if size == self._per_stack_size:
+        return Exception(f"Stack {stack_number} is full.")
+      self._values[stack_number * self._per_stack_size + size] = value
+      self._sizes[stack_number] = size + 1
+
+  def pop(self, stack_number: int):
+    with self._locks[stack_number]:
+      size = int(self._sizes[stack_number])
+      if size == 0:
+        return Exception(f"Stack {stack_number} is empty.")
+      self._sizes[stack_number] = size - 1
+      return self._values[stack_number * self._per_stack_size + size - 1]
+
+  def peek(self, stack_number: int):
+    with self._locks[stack_number]:
+      size = int(self._sizes[stack_number])
+      if size == 0:
+        return Exception(f"Stack {stack_number} is empty.")
+      return self._values[stack_number * self._per_stack_size + size - 1]
+
+  def size(self, stack_number: int) -> int:
+    return int(self._sizes[stack_number])
+
+  def close(self):
+    # Arrays viewing the block must be released before it can be closed
+    self._sizes = self._values = None
+    self._shm.close()
+
+  def unlink(self):
+    """Free the shared memory block (creator only, after every process has closed it)"""
+    if self._owner:
+      self._shm.unlink()
+
+  def __enter__(self) -> 'SharedMultiStack':
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+    self.unlink()
+
+def _benchmark_worker(ms: SharedMultiStack, stack_number: int, operations: int, start_event):
+  start_event.wait()
+  for val in range(operations):
+    ms.push(stack_number, val)
+    ms.pop(stack_number)
+  ms.close()
+
+def benchmark_process_throughput(process_counts: Iterable[int] = (1, 2, 4), operations: int = 100000,
+                                 shared_stack: bool = False) -> Dict[int, float]:
+  """Measure push+pop pairs per second with 1..N worker processes
+
+  :param shared_stack: All workers use stack 0 (one lock contended), instead of one stack each
+  :return: Push+pop pairs per second per process count
+  """
+  throughput: Dict[int, float] = {}
+  for processes in process_counts:
+    with SharedMultiStack(processes, 16) as ms:
+      start_event = mp.Event()
+      workers = [mp.Process(target=_benchmark_worker,
+                            args=(ms, 0 if shared_stack else idx, operations, start_event))
+                 for idx in range(processes)]
+      for worker in workers:
+        worker.start()
+      tic = time.perf_counter()
+      start_event.set()
+      for worker in workers:
+        worker.join()
+      throughput[processes] = processes * operations / (time.perf_counter() - tic)
+  return throughput
+
+def _test_worker(ms: SharedMultiStack, stack_number: int, count: int):
+  for val in range(count):
+    ms.push(stack_number, stack_number * 1000 + val)
+  ms.push(0, -1)
+  ms.close()
+
+class TestSharedMultiStack:
+  def test_push_pop_peek(self):
+    with SharedMultiStack(3, 2, dtype=np.int64) as ms:
+      ms.push(0, 1)
+      ms.push(0, 2)
+      assert isinstance(ms.push(0, 3), Exception)
+      assert ms.peek(0) == 2
+      assert ms.pop(0) == 2 and ms.pop(0) == 1
+      assert isinstance(ms.pop(0), Exception)
+      assert ms._values.dtype == np.int64
+
+  def test_attach_by_name(self):
+    with SharedMultiStack(2, 4) as ms:
+      ms.push(1, 7.5)
+      attached = SharedMultiStack.attach(ms.name, ms.locks)
+      assert attached.pop(1) == 7.5
+      attached.push(0, 3.0)
+      attached.close()
+      assert ms.pop(0) == 3.0
+
+  def test_wrong_lock_count_leaves_no_block(self):
+    name = f"shared_multistack_test_{os.getpid()}"
+    with pytest.raises(ValueError):
+      SharedMultiStack(2, 4, locks=[mp.Lock()], name=name)
+    with pytest.raises(FileNotFoundError):
+      shared_memory.SharedMemory(name=name)
+
+  def test_worker_processes(self):
+    with SharedMultiStack(3, 100) as ms:
+      workers = [mp.Process(target=_test_worker, args=(ms, idx, 50)) for idx in (1, 2)]
+      for worker in workers:
+        worker.start()
+      for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+      for stack_number in (1, 2):
+        assert [ms.pop(stack_number) for _ in range(50)] == [stack_number * 1000 + val for val in range(49, -1, -1)]
+      assert [ms.pop(0), ms.pop(0)] == [-1, -1]
+
+if (__name__ == '__main__'):
+  pytest.main(["--durations", "0"])